@@ -4,16 +4,38 @@ import asyncio
 import logging
 import sys
 import json
+import hashlib
 from pathlib import Path
 
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.client.default import DefaultBotProperties
-from sqlalchemy import select
+from sqlalchemy import select, insert, func, text
+
+try:
+    import orjson
+    json_loads = orjson.loads
+    json_dumps = orjson.dumps
+except ImportError:  # orjson is optional, fall back to stdlib json
+    json_loads = json.loads
+    json_dumps = json.dumps
+
+try:
+    import uvloop
+except ImportError:  # uvloop is optional (not available on Windows)
+    uvloop = None
 
 import config
-from models.models import init_db, close_db, get_session_maker, Situation
+from models.models import init_db, close_db, SessionLocal, dialect_insert, Situation, Vocabulary, Meta
+from middlewares.chat_lock import ChatLockMiddleware
+from middlewares.rate_limit import OutboundRateLimitMiddleware
+from middlewares.session_cleanup import SessionCleanupMiddleware
+from utils.scenario_cache import invalidate_scenarios
+from utils.states import FillBlankTraining, SRSReview
+from services.history_writer import history_writer
+from services.tts_service import tts_service
+from services.http_client import close_http_client
 from handlers import common, survival, review, settings, flashcard_learning, fill_blank_training, vocabulary_browser
 
 # Configure logging
@@ -26,8 +48,39 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+SITUATIONS_HASH_KEY = "situations_hash"
+WORDS_HASH_KEY = "initial_words_hash"
+
+
+async def get_seed_hashes() -> dict:
+    """Get stored hashes of all seed files in a single query."""
+    async with SessionLocal() as session:
+        result = await session.execute(
+            select(Meta).where(Meta.key.in_([SITUATIONS_HASH_KEY, WORDS_HASH_KEY]))
+        )
+        return {meta.key: meta.value for meta in result.scalars().all()}
 
-async def load_initial_data():
+
+async def set_seed_hash(session, key: str, value: str):
+    """Store hash of a seed file (caller commits)."""
+    await session.merge(Meta(key=key, value=value))
+
+
+async def relax_commit_durability(session):
+    """
+    Don't wait for WAL flush when committing the current seeding transaction.
+    
+    Seed data is reproducible from JSON (and the hash is stored in the same
+    transaction), so a lost commit just means reseeding on next start.
+    SET LOCAL reverts automatically at transaction end. SQLite seeding already
+    runs as a single transaction, and its PRAGMA synchronous is per-connection
+    state that would leak into the pool, so it is left untouched there.
+    """
+    if session.bind.dialect.name == 'postgresql':
+        await session.execute(text("SET LOCAL synchronous_commit = OFF"))
+
+
+async def load_initial_data(seed_hashes: dict = None):
     """Load initial situations data into database."""
     logger.info("Loading initial situation data...")
     
@@ -38,44 +91,49 @@ async def load_initial_data():
         logger.warning("situations.json not found, skipping initial data load")
         return
     
-    with open(situations_file, 'r', encoding='utf-8') as f:
-        situations_data = json.load(f)
+    raw_data = situations_file.read_bytes()
+    data_hash = hashlib.sha256(raw_data).hexdigest()
     
-    session_maker = get_session_maker()
-    async with session_maker() as session:
-        from sqlalchemy import text
-        
-        # Ensure column exists (simple migration)
-        try:
-            await session.execute(text("ALTER TABLE situations ADD COLUMN IF NOT EXISTS vocabulary_focus JSON"))
-            await session.commit()
-        except Exception as e:
-            logger.warning(f"Migration warning: {e}")
+    # Skip reseeding (without opening a session) if the file hasn't changed
+    if seed_hashes is None:
+        seed_hashes = await get_seed_hashes()
+    if seed_hashes.get(SITUATIONS_HASH_KEY) == data_hash:
+        logger.info("✅ Situations unchanged, skipping initial data load")
+        return
+    
+    situations_data = json_loads(raw_data)
+    
+    async with SessionLocal() as session:
+        await relax_commit_durability(session)
         
         # Add situations only if they don't exist (don't delete to avoid foreign key issues)
-        for situation_data in situations_data:
-            # Check if situation exists by title
-            existing = await session.execute(
-                select(Situation).where(Situation.title == situation_data['title'])
-            )
-            if existing.scalar_one_or_none():
-                continue  # Skip if already exists
-            
-            situation = Situation(
-                title=situation_data['title'],
-                description=situation_data['description'],
-                level=situation_data['level'],
-                context_prompt=situation_data['context_prompt'],
-                is_active=situation_data.get('is_active', True),
-                vocabulary_focus=situation_data.get('vocabulary_focus', [])
-            )
-            session.add(situation)
+        existing_result = await session.execute(select(Situation.title))
+        existing_titles = set(existing_result.scalars().all())
+        
+        rows = [
+            {
+                "title": situation_data['title'],
+                "description": situation_data['description'],
+                "level": situation_data['level'],
+                "context_prompt": situation_data['context_prompt'],
+                "is_active": situation_data.get('is_active', True),
+                "vocabulary_focus": situation_data.get('vocabulary_focus', [])
+            }
+            for situation_data in situations_data
+            if situation_data['title'] not in existing_titles
+        ]
         
+        # Single executemany INSERT instead of one roundtrip per situation
+        if rows:
+            await session.execute(insert(Situation), rows)
+        
+        await set_seed_hash(session, SITUATIONS_HASH_KEY, data_hash)
         await session.commit()
+        invalidate_scenarios()
         logger.info(f"✅ Loaded {len(situations_data)} situations")
 
 
-async def load_initial_words():
+async def load_initial_words(seed_hashes: dict = None):
     """Load initial vocabulary words into database."""
     logger.info("Loading initial vocabulary words...")
     
@@ -86,58 +144,67 @@ async def load_initial_words():
         logger.warning("initial_words.json not found, skipping initial words load")
         return
     
-    with open(words_file, 'r', encoding='utf-8') as f:
-        words_data = json.load(f)
+    raw_data = words_file.read_bytes()
+    data_hash = hashlib.sha256(raw_data).hexdigest()
     
-    session_maker = get_session_maker()
-    async with session_maker() as session:
-        from models.models import Vocabulary
-        from sqlalchemy import text
-        
-        # Ensure new columns exist (simple migration)
-        try:
-            await session.execute(text("ALTER TABLE vocabulary ADD COLUMN IF NOT EXISTS example_sentence_pl TEXT"))
-            await session.execute(text("ALTER TABLE vocabulary ADD COLUMN IF NOT EXISTS emoji VARCHAR(10)"))
-            await session.commit()
-        except Exception as e:
-            logger.warning(f"Migration warning: {e}")
+    # Skip reseeding (without opening a session) if the file hasn't changed
+    if seed_hashes is None:
+        seed_hashes = await get_seed_hashes()
+    if seed_hashes.get(WORDS_HASH_KEY) == data_hash:
+        logger.info("✅ Vocabulary unchanged, skipping initial words load")
+        return
+    
+    words_data = json_loads(raw_data)
+    rows = [
+        {
+            "word_polish": word_data['word_polish'],
+            "translation_ua": word_data['translation_ua'],
+            "translation_ru": word_data['translation_ru'],
+            "example_sentence_pl": word_data.get('example_sentence_pl'),
+            "emoji": word_data.get('emoji'),
+            "category": word_data.get('category', 'general'),
+            "difficulty_level": word_data.get('difficulty_level', 'A1')
+        }
+        for word_data in words_data
+    ]
+    
+    if not rows:
+        logger.info("No words in initial_words.json, skipping initial words load")
+        return
+    
+    async with SessionLocal() as session:
+        await relax_commit_durability(session)
         
-        # Add or update words
-        added_count = 0
-        updated_count = 0
-        for word_data in words_data:
-            # Check if word already exists
-            existing = await session.execute(
-                select(Vocabulary).where(Vocabulary.word_polish == word_data['word_polish'])
-            )
-            existing_word = existing.scalar_one_or_none()
-            
-            if existing_word:
-                # ALWAYS update emoji and example from JSON
-                if word_data.get('emoji'):
-                    existing_word.emoji = word_data.get('emoji')
-                if word_data.get('example_sentence_pl'):
-                    existing_word.example_sentence_pl = word_data.get('example_sentence_pl')
-                updated_count += 1
-                continue
-            
-            word = Vocabulary(
-                word_polish=word_data['word_polish'],
-                translation_ua=word_data['translation_ua'],
-                translation_ru=word_data['translation_ru'],
-                example_sentence_pl=word_data.get('example_sentence_pl'),
-                emoji=word_data.get('emoji'),
-                category=word_data.get('category', 'general'),
-                difficulty_level=word_data.get('difficulty_level', 'A1')
-            )
-            session.add(word)
-            added_count += 1
+        # Insert new words and refresh emoji/example of existing ones in a single
+        # statement; the unique word_polish index resolves conflicts server-side
+        stmt = dialect_insert(Vocabulary)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Vocabulary.word_polish],
+            set_={
+                "emoji": func.coalesce(stmt.excluded.emoji, Vocabulary.emoji),
+                "example_sentence_pl": func.coalesce(
+                    stmt.excluded.example_sentence_pl, Vocabulary.example_sentence_pl
+                )
+            }
+        )
+        await session.execute(stmt, rows)
         
+        await set_seed_hash(session, WORDS_HASH_KEY, data_hash)
         await session.commit()
-        logger.info(f"✅ Loaded {added_count} new words, updated {updated_count} existing")
+        logger.info(f"✅ Loaded {len(rows)} words (new words added, existing updated)")
 
 
 
+def create_storage():
+    """Create FSM storage: Redis when REDIS_URL is set, otherwise in-memory."""
+    if not config.REDIS_URL:
+        return MemoryStorage()
+    
+    from aiogram.fsm.storage.redis import RedisStorage
+    logger.info("Using Redis FSM storage")
+    return RedisStorage.from_url(config.REDIS_URL, json_loads=json_loads, json_dumps=json_dumps)
+
+
 async def main():
     """Main bot function."""
     # Validate configuration
@@ -155,20 +222,37 @@ async def main():
     # Initialize database
     await init_db()
     
-    # Load initial data
-    await load_initial_data()
+    # Load initial situations and vocabulary concurrently (independent tables,
+    # separate sessions); stored seed hashes are fetched once for both
+    seed_hashes = await get_seed_hashes()
+    await asyncio.gather(load_initial_data(seed_hashes), load_initial_words(seed_hashes))
     
-    # Load initial vocabulary words
-    await load_initial_words()
-
+    # Batched background writes of quiz history
+    history_writer.start()
+    
+    # Old TTS audio is removed in the background (sent audio is reused by file_id)
+    tts_service.start()
     
     # Initialize bot and dispatcher
     bot = Bot(
         token=config.BOT_TOKEN,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
+    bot.session.middleware(OutboundRateLimitMiddleware(config.TELEGRAM_SEND_RATE))
+    
+    dp = Dispatcher(storage=create_storage())
+    
+    # Updates are handled as separate tasks; keep them ordered per chat
+    chat_lock = ChatLockMiddleware()
+    dp.message.middleware(chat_lock)
+    dp.callback_query.middleware(chat_lock)
     
-    dp = Dispatcher(storage=MemoryStorage())
+    # Prefetched questions are dropped as soon as the user leaves the mode
+    session_cleanup = SessionCleanupMiddleware()
+    session_cleanup.register(FillBlankTraining, fill_blank_training.has_prefetch, fill_blank_training.cancel_prefetch)
+    session_cleanup.register(SRSReview, review.has_next_question, review.cancel_next_question)
+    dp.message.middleware(session_cleanup)
+    dp.callback_query.middleware(session_cleanup)
     
     # Register routers
     dp.include_router(common.router)
@@ -184,18 +268,24 @@ async def main():
     logger.info(f"🗄️ Database: {config.DATABASE_URL}")
     
     try:
-        # Start polling
-        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+        # Start long polling (50s is the Bot API maximum wait for getUpdates)
+        allowed_updates = dp.resolve_used_update_types()
+        await dp.start_polling(bot, polling_timeout=50, allowed_updates=allowed_updates)
     finally:
         # Cleanup
         await bot.session.close()
+        await dp.storage.close()
+        await history_writer.stop()
+        await tts_service.stop()
+        await close_http_client()
         await close_db()
         logger.info("👋 Bot stopped")
 
 
 if __name__ == "__main__":
+    run = uvloop.run if uvloop is not None else asyncio.run
     try:
-        asyncio.run(main())
+        run(main())
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
     except Exception as e:
@@ -12,12 +12,27 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
 GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")  # Latest model from Groq
 GROQ_TEMPERATURE = float(os.getenv("GROQ_TEMPERATURE", "0.7"))
 GROQ_MAX_TOKENS = int(os.getenv("GROQ_MAX_TOKENS", "1024"))
+GROQ_MAX_PARALLEL = int(os.getenv("GROQ_MAX_PARALLEL", "5"))  # Concurrent background generations
+GROQ_RETRY_MAX_DELAY = 8  # Cap of exponential backoff between retries (seconds)
+GROQ_RATE_LIMIT_DELAY = 10  # Wait after a 429 without Retry-After (seconds)
 
 # OpenAI API Configuration (for TTS)
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
 
+# Shared HTTP pool for Groq/OpenAI requests
+HTTP_MAX_CONNECTIONS = 64
+HTTP_MAX_KEEPALIVE = 32
+HTTP_KEEPALIVE_EXPIRY = 60  # Seconds an idle connection stays open
+
 # Database Configuration
 DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite+aiosqlite:///data/database.db')
+if DATABASE_URL.startswith('postgresql://'):
+    # Railway provides a plain postgresql:// URL; the bot needs the async driver
+    DATABASE_URL = DATABASE_URL.replace('postgresql://', 'postgresql+asyncpg://', 1)
+DB_QUERY_CACHE_SIZE = int(os.getenv('DB_QUERY_CACHE_SIZE', '1200'))  # Compiled SQL statements kept by SQLAlchemy
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))  # PostgreSQL connections kept open
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '20'))  # Extra connections under load
+DB_PREPARED_STATEMENT_CACHE_SIZE = int(os.getenv('DB_PREPARED_STATEMENT_CACHE_SIZE', '500'))  # asyncpg, per connection
 
 # SRS Algorithm Parameters
 SRS_MIN_EASINESS = float(os.getenv('SRS_MIN_EASINESS', '1.3'))
@@ -28,6 +43,33 @@ SRS_GRADUATION_INTERVAL = int(os.getenv('SRS_GRADUATION_INTERVAL', '6'))
 MAX_REVIEWS_PER_SESSION = 10
 REVIEW_CHECK_INTERVAL = 3600  # Check every hour (in seconds)
 
+# User Cache Settings
+USER_CACHE_TTL = 60  # Seconds before cached user data is reloaded
+USER_CACHE_MAX_SIZE = 10000
+
+# AI Cache Settings
+AI_CACHE_TTL = 7 * 86400  # Seconds a cached AI question stays valid
+AI_CACHE_VARIANTS = 3  # Distinct questions kept per word and level
+AI_FALLBACK_TIMEOUT = 4.0  # Seconds to wait for the LLM before serving a cached variant
+
+# Scenario Cache Settings
+SCENARIO_CACHE_TTL = 300  # Seconds before cached scenario lists are reloaded
+
+# Vocabulary Browser Cache Settings
+VOCAB_PAGE_CACHE_TTL = 600  # Seconds before rendered pages are rebuilt
+VOCAB_PAGE_CACHE_MAX_USERS = 1000
+
+# Quiz History Writer Settings
+HISTORY_BATCH_SIZE = 50  # Rows per INSERT
+HISTORY_FLUSH_INTERVAL = 0.1  # Seconds to wait for a batch to fill
+HISTORY_QUEUE_MAX_SIZE = 10000
+
+# Telegram Settings
+TELEGRAM_SEND_RATE = int(os.getenv('TELEGRAM_SEND_RATE', '30'))  # Outgoing messages per second
+
+# FSM Storage (Redis when set, memory storage if empty)
+REDIS_URL = os.getenv('REDIS_URL', '')
+
 # Logging Configuration
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 
@@ -38,6 +80,8 @@ DIFFICULTY_THRESHOLD = 5  # After 5 correct answers, increase difficulty
 TTS_MODEL = "tts-1"
 TTS_VOICE = "alloy"
 TTS_AUDIO_DIR = "audio"
+TTS_CACHE_MAX_AGE_DAYS = 7  # Cached audio older than this is deleted
+TTS_CLEANUP_INTERVAL = 86400  # Seconds between cache cleanups
 
 # Validate required environment variables
 def validate_config():
@@ -4,36 +4,87 @@ from aiogram import Router, F
 from aiogram.filters import CommandStart, Command
 from aiogram.types import Message, CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.fsm.context import FSMContext
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from models import models
-from models.models import User
+from models.models import SessionLocal, ReadSessionLocal, User
 from utils.states import MainMenu, FlashcardLearning
 from utils.keyboards import get_main_menu_keyboard
+from utils.user_cache import get_user, cache_user
 
 router = Router()
 
+HELP_TEXT = (
+    "ℹ️ <b>Допомога EasyPolska Bot</b>\n\n"
+    "<b>Команди:</b>\n"
+    "/start - Запустити бота\n"
+    "/help - Показати цю допомогу\n"
+    "/stats - Переглянути статистику навчання\n"
+    "/menu - Повернутися до головного меню\n\n"
+    "<b>Як це працює:</b>\n\n"
+    "🎯 <b>Режим Виживання</b>\n"
+    "Вчи польську через реальні життєві ситуації: покупки, замовлення їжі, громадський транспорт. "
+    "Кожна ситуація включає аудіо вимову та складні тести, розроблені спеціально для слов'ян.\n\n"
+    "📚 <b>Повторення Слів</b>\n"
+    "Наша розумна система інтервального повторення гарантує, що ти не забудеш вивчене. "
+    "Слова повторюються в оптимальні інтервали на основі твоїх результатів.\n\n"
+    "📊 <b>Відстеження Прогресу</b>\n"
+    "Відстежуй свою серію, розмір словника та рівень володіння.\n\n"
+    "Потрібна допомога? Напиши @your_support_username"
+)
+
+TRAINING_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="📝 Тренування з пропусками", callback_data="fill_blank_training")],
+    [InlineKeyboardButton(text="🎯 Режим виживання", callback_data="survival_mode")]
+])
+
+FLASHCARD_START_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="▶️ Почати", callback_data="flashcard_show_next")]
+])
+
+MENU_TEXT = "🏠 <b>Головне Меню</b>\n\nЩо ти хочеш зробити?"
+
+PROGRESS_TEMPLATE = (
+    "📊 <b>Твій Прогрес</b>\n\n"
+    "🎯 <b>Рівень:</b> {level}\n\n"
+    "📚 <b>Словник:</b>\n"
+    "   ✅ Знаю: {known_words}\n"
+    "   📖 Вивчаю: {learning_words}\n"
+    "   🆕 Нові: {new_words}\n\n"
+    "🔄 <b>Повторення:</b>\n"
+    "   📝 До повторення: {due_count} слів\n\n"
+    "Продовжуй навчання! 💪"
+)
+
+STATS_TEMPLATE = (
+    "📊 <b>Твоя Статистика Навчання</b>\n\n"
+    "🎚 Рівень: <b>{level}</b>\n"
+    "🔥 Серія: <b>{streak_days} днів</b>\n\n"
+    "📚 <b>Словник:</b>\n"
+    "   Всього Слів: {total_words}\n"
+    "   ⏰ До Повторення: {due_now}\n"
+    "   ✅ Засвоєно: {mastered}\n"
+    "   📖 Вивчається: {learning}\n"
+    "   🆕 Нові: {new}\n\n"
+    "Продовжуй у тому ж дусі! 💪"
+)
 
 @router.message(CommandStart())
 async def cmd_start(message: Message, state: FSMContext):
     """Handle /start command."""
-    session_maker = models.get_session_maker()
-    async with session_maker() as session:
+    async with SessionLocal() as session:
         # Create or get user
-        user_query = select(User).where(User.telegram_id == message.from_user.id)
-        result = await session.execute(user_query)
-        user = result.scalar_one_or_none()
+        user = await get_user(session, message.from_user.id)
         
         if not user:
-            user = User(
+            new_user = User(
                 telegram_id=message.from_user.id,
                 username=message.from_user.username,
                 first_name=message.from_user.first_name,
                 level='A1'
             )
-            session.add(user)
+            session.add(new_user)
             await session.commit()
+            cache_user(message.from_user.id, new_user)
             
             welcome_text = (
                 f"Привіт, <b>{message.from_user.first_name}</b>! 👋\n\n"
@@ -66,36 +117,14 @@ async def cmd_start(message: Message, state: FSMContext):
 @router.message(Command("help"))
 async def cmd_help(message: Message):
     """Handle /help command."""
-    help_text = (
-        "ℹ️ <b>Допомога EasyPolska Bot</b>\n\n"
-        "<b>Команди:</b>\n"
-        "/start - Запустити бота\n"
-        "/help - Показати цю допомогу\n"
-        "/stats - Переглянути статистику навчання\n"
-        "/menu - Повернутися до головного меню\n\n"
-        "<b>Як це працює:</b>\n\n"
-        "🎯 <b>Режим Виживання</b>\n"
-        "Вчи польську через реальні життєві ситуації: покупки, замовлення їжі, громадський транспорт. "
-        "Кожна ситуація включає аудіо вимову та складні тести, розроблені спеціально для слов'ян.\n\n"
-        "📚 <b>Повторення Слів</b>\n"
-        "Наша розумна система інтервального повторення гарантує, що ти не забудеш вивчене. "
-        "Слова повторюються в оптимальні інтервали на основі твоїх результатів.\n\n"
-        "📊 <b>Відстеження Прогресу</b>\n"
-        "Відстежуй свою серію, розмір словника та рівень володіння.\n\n"
-        "Потрібна допомога? Напиши @your_support_username"
-    )
-    
-    await message.answer(help_text, parse_mode='HTML')
+    await message.answer(HELP_TEXT, parse_mode='HTML')
 
 
 @router.callback_query(F.data == "my_progress")
 async def show_progress(callback: CallbackQuery, state: FSMContext):
     """Show user progress and statistics."""
-    session_maker = models.get_session_maker()
-    async with session_maker() as session:
-        query = select(User).where(User.telegram_id == callback.from_user.id)
-        result = await session.execute(query)
-        user = result.scalar_one_or_none()
+    async with ReadSessionLocal() as session:
+        user = await get_user(session, callback.from_user.id)
         
         if not user:
             await callback.answer("❌ User not found!", show_alert=True)
@@ -107,19 +136,9 @@ async def show_progress(callback: CallbackQuery, state: FSMContext):
         
         # Get SRS stats
         from services.srs_service import srs_service
-        due_count = len(await srs_service.get_due_words(session, user.id))
+        due_count = await srs_service.get_due_count(session, user.id)
         
-        text = (
-            f"📊 <b>Твій Прогрес</b>\n\n"
-            f"🎯 <b>Рівень:</b> {user.level}\n\n"
-            f"📚 <b>Словник:</b>\n"
-            f"   ✅ Знаю: {stats['known_words']}\n"
-            f"   📖 Вивчаю: {stats['learning_words']}\n"
-            f"   🆕 Нові: {stats['new_words']}\n\n"
-            f"🔄 <b>Повторення:</b>\n"
-            f"   📝 До повторення: {due_count} слів\n\n"
-            "Продовжуй навчання! 💪"
-        )
+        text = PROGRESS_TEMPLATE.format(level=user.level, due_count=due_count, **stats)
         
         await callback.message.edit_text(
             text,
@@ -129,26 +148,21 @@ async def show_progress(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-# Bottom menu handlers
-@router.message(F.text == "🏠")
+# Bottom menu handlers (dispatched by handle_bottom_menu)
 async def handle_home_button(message: Message, state: FSMContext):
     """Handle home button from bottom menu."""
     await state.clear()
     await cmd_start(message, state)
 
 
-@router.message(F.text == "📚")
 async def handle_flashcard_button(message: Message, state: FSMContext):
     """Handle flashcard button from bottom menu."""
     # Create fake callback for reusing existing handler
     from aiogram.types import User as TgUser
     from handlers import flashcard_learning
     
-    session_maker = models.get_session_maker()
-    async with session_maker() as session:
-        query = select(User).where(User.telegram_id == message.from_user.id)
-        result = await session.execute(query)
-        user = result.scalar_one_or_none()
+    async with ReadSessionLocal() as session:
+        user = await get_user(session, message.from_user.id)
         
         if not user:
             await message.answer("❌ Помилка!")
@@ -168,38 +182,23 @@ async def handle_flashcard_button(message: Message, state: FSMContext):
         "Готовий почати? 🚀"
     )
     
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="▶️ Почати", callback_data="flashcard_show_next")]
-    ])
-    
-    await message.answer(text, reply_markup=keyboard, parse_mode='HTML')
+    await message.answer(text, reply_markup=FLASHCARD_START_KB, parse_mode='HTML')
 
 
-@router.message(F.text == "📝")
 async def handle_training_button(message: Message, state: FSMContext):
     """Handle training button from bottom menu."""
     # Redirect to fill blank training
-    
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="📝 Тренування з пропусками", callback_data="fill_blank_training")],
-        [InlineKeyboardButton(text="🎯 Режим виживання", callback_data="survival_mode")]
-    ])
-    
     await message.answer(
         "📝 <b>Вибери тип тренування:</b>",
-        reply_markup=keyboard,
+        reply_markup=TRAINING_KB,
         parse_mode='HTML'
     )
 
 
-@router.message(F.text == "📊")
 async def handle_progress_button(message: Message, state: FSMContext):
     """Handle progress button from bottom menu."""
-    session_maker = models.get_session_maker()
-    async with session_maker() as session:
-        query = select(User).where(User.telegram_id == message.from_user.id)
-        result = await session.execute(query)
-        user = result.scalar_one_or_none()
+    async with ReadSessionLocal() as session:
+        user = await get_user(session, message.from_user.id)
         
         if not user:
             await message.answer("❌ Помилка!")
@@ -209,33 +208,34 @@ async def handle_progress_button(message: Message, state: FSMContext):
         stats = await flashcard_service.get_learning_stats(session, user.id)
         
         from services.srs_service import srs_service
-        due_count = len(await srs_service.get_due_words(session, user.id))
+        due_count = await srs_service.get_due_count(session, user.id)
         
-        text = (
-            f"📊 <b>Твій Прогрес</b>\n\n"
-            f"🎯 <b>Рівень:</b> {user.level}\n\n"
-            f"📚 <b>Словник:</b>\n"
-            f"   ✅ Знаю: {stats['known_words']}\n"
-            f"   📖 Вивчаю: {stats['learning_words']}\n"
-            f"   🆕 Нові: {stats['new_words']}\n\n"
-            f"🔄 <b>Повторення:</b>\n"
-            f"   📝 До повторення: {due_count} слів\n\n"
-            "Продовжуй навчання! 💪"
-        )
+        text = PROGRESS_TEMPLATE.format(level=user.level, due_count=due_count, **stats)
         
         await message.answer(text, parse_mode='HTML')
 
 
+BOTTOM_MENU = {
+    "🏠": handle_home_button,
+    "📚": handle_flashcard_button,
+    "📝": handle_training_button,
+    "📊": handle_progress_button,
+}
+
+
+@router.message(F.text.in_(BOTTOM_MENU))
+async def handle_bottom_menu(message: Message, state: FSMContext):
+    """Dispatch bottom menu button presses."""
+    await BOTTOM_MENU[message.text](message, state)
+
+
 @router.message(Command("stats"))
 async def cmd_stats(message: Message):
     """Handle /stats command."""
     from services.srs_service import srs_service
     
-    session_maker = models.get_session_maker()
-    async with session_maker() as session:
-        query = select(User).where(User.telegram_id == message.from_user.id)
-        result = await session.execute(query)
-        user = result.scalar_one_or_none()
+    async with ReadSessionLocal() as session:
+        user = await get_user(session, message.from_user.id)
         
         if not user:
             await message.answer("❌ Будь ласка, спочатку використай /start!")
@@ -243,33 +243,21 @@ async def cmd_stats(message: Message):
         
         stats = await srs_service.get_review_stats(session, user.id)
     
-    stats_text = (
-        f"📊 <b>Твоя Статистика Навчання</b>\n\n"
-        f"🎚 Рівень: <b>{user.level}</b>\n"
-        f"🔥 Серія: <b>{user.streak_days} днів</b>\n\n"
-        f"📚 <b>Словник:</b>\n"
-        f"   Всього Слів: {stats['total_words']}\n"
-        f"   ⏰ До Повторення: {stats['due_now']}\n"
-        f"   ✅ Засвоєно: {stats['mastered']}\n"
-        f"   📖 Вивчається: {stats['learning']}\n"
-        f"   🆕 Нові: {stats['new']}\n\n"
-        "Продовжуй у тому ж дусі! 💪"
-    )
+    stats_text = STATS_TEMPLATE.format(level=user.level, streak_days=user.streak_days, **stats)
     
     await message.answer(stats_text, parse_mode='HTML')
 
 
 @router.message(Command("menu"))
+async def show_main_menu(message: Message, state: FSMContext):
+    """Show main menu as a new message."""
+    await state.set_state(MainMenu.menu)
+    await message.answer(MENU_TEXT, reply_markup=get_main_menu_keyboard(), parse_mode='HTML')
+
+
 @router.callback_query(F.data == "main_menu")
-async def show_main_menu(event: Message | CallbackQuery, state: FSMContext):
-    """Show main menu."""
+async def show_main_menu_callback(callback: CallbackQuery, state: FSMContext):
+    """Show main menu in place of the current message."""
     await state.set_state(MainMenu.menu)
-    
-    text = "🏠 <b>Головне Меню</b>\n\nЩо ти хочеш зробити?"
-    keyboard = get_main_menu_keyboard()
-    
-    if isinstance(event, Message):
-        await event.answer(text, reply_markup=keyboard, parse_mode='HTML')
-    else:
-        await event.message.edit_text(text, reply_markup=keyboard, parse_mode='HTML')
-        await event.answer()
+    await callback.message.edit_text(MENU_TEXT, reply_markup=get_main_menu_keyboard(), parse_mode='HTML')
+    await callback.answer()
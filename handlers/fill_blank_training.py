@@ -1,78 +1,160 @@
 """Handlers for fill-in-the-blank training mode."""
 
 from aiogram import Router, F
-from aiogram.types import CallbackQuery
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
-from sqlalchemy import select
-import random
+import asyncio
 
-from models import models
-from models.models import User
+from models.models import SessionLocal, ReadSessionLocal
 from utils.states import FillBlankTraining, MainMenu
-from utils.keyboards import get_quiz_keyboard, get_main_menu_keyboard
+from utils.user_cache import get_user
+from utils.keyboards import get_quiz_keyboard, get_main_menu_keyboard, get_answer_index_map
 from services.srs_service import srs_service
-from services.ai_service import ai_service
+from services.ai_service import ai_service, shuffle_answers, BackgroundGeneration
 
 router = Router()
 
+# Callback data of quiz answer buttons -> answer index
+ANSWER_INDEX = get_answer_index_map("fill_blank")
+
+NO_WORDS_TEXT = (
+    "🎉 <b>Відмінна робота!</b>\n\n"
+    "Зараз немає слів для тренування.\n"
+    "Спробуй вивчити нові слова в режимі карток! 📚"
+)
+
+START_TEMPLATE = (
+    "📝 <b>Тренування з Пропусками</b>\n\n"
+    "У тебе <b>{count}</b> слово(ів) для тренування.\n\n"
+    "AI згенерує речення з пропуском, а ти обереш правильне слово.\n"
+    "Після відповіді отримаєш детальне пояснення українською! 🇺🇦\n\n"
+    "Готовий? 🚀"
+)
+
+RESULTS_TEMPLATE = (
+    "🎉 <b>Тренування Завершено!</b>\n\n"
+    "📊 <b>Результати:</b>\n"
+    "   Правильних відповідей: <b>{correct}/{total}</b>\n"
+    "   Відсоток: <b>{percentage:.1f}%</b>\n\n"
+    "{verdict}"
+)
+
+# (minimum percentage, message), checked in order
+VERDICTS = [
+    (80, "🌟 Відмінна робота! Ти молодець!"),
+    (60, "👍 Добре! Продовжуй навчання!"),
+    (0, "💪 Не здавайся! Практика – шлях до успіху!"),
+]
+
+START_TRAINING_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="▶️ Почати Тренування", callback_data="show_fill_blank_question")],
+    [InlineKeyboardButton(text="🔙 Головне Меню", callback_data="main_menu")]
+])
+
+NEXT_QUESTION_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="➡️ Наступне Питання", callback_data="next_fill_blank")],
+    [InlineKeyboardButton(text="🔙 Головне Меню", callback_data="main_menu")]
+])
+
+COMPLETE_TRAINING_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="✅ Завершити Тренування", callback_data="complete_fill_blank")],
+    [InlineKeyboardButton(text="🔙 Головне Меню", callback_data="main_menu")]
+])
+
+# telegram_id -> {word_id: background generation of that word's question}
+_question_tasks: dict[int, dict[int, BackgroundGeneration]] = {}
+
+
+async def generate_question(word: dict, user_level: str):
+    """Generate fill-in-the-blank question for a batch word."""
+    return await ai_service.generate_fill_in_blank(
+        word=word['word_polish'],
+        translation_ua=word['translation_ua'],
+        translation_ru=word['translation_ru'],
+        user_level=user_level
+    )
+
+
+def prefetch_questions(telegram_id: int, words: list[dict], user_level: str):
+    """Start generating questions for the whole session in the background."""
+    cancel_prefetch(telegram_id)
+    _question_tasks[telegram_id] = {
+        word['word_id']: BackgroundGeneration(generate_question(word, user_level))
+        for word in words
+    }
+
+
+def has_prefetch(telegram_id: int) -> bool:
+    """Check whether user has prefetched questions."""
+    return telegram_id in _question_tasks
+
+
+def cancel_prefetch(telegram_id: int):
+    """Drop pending generated questions for user."""
+    generations = _question_tasks.pop(telegram_id, {})
+    for generation in generations.values():
+        generation.cancel()
+
+
+async def get_question(telegram_id: int, word: dict, user_level: str):
+    """Get question for word, reusing the prefetched one when available."""
+    generations = _question_tasks.get(telegram_id, {})
+    generation = generations.pop(word['word_id'], None)
+    if not generations:
+        _question_tasks.pop(telegram_id, None)
+    
+    if generation:
+        try:
+            # User is waiting now: skip the background queue
+            question_data = await generation.result()
+            if question_data:
+                return question_data
+        except Exception as e:
+            print(f"⚠️ Prefetched question failed, regenerating: {e}")
+    
+    return await generate_question(word, user_level)
+
 
 @router.callback_query(F.data == "fill_blank_training")
 async def start_fill_blank_training(callback: CallbackQuery, state: FSMContext):
     """Start fill-in-the-blank training session."""
-    session_maker = models.get_session_maker()
-    async with session_maker() as session:
-        # Get user
-        query = select(User).where(User.telegram_id == callback.from_user.id)
-        result = await session.execute(query)
-        user = result.scalar_one_or_none()
+    async with ReadSessionLocal() as session:
+        user = await get_user(session, callback.from_user.id)
         
         if not user:
             await callback.answer("❌ Помилка: користувач не знайдений!", show_alert=True)
             return
         
-        # Get due words for practice
-        due_words = await srs_service.get_due_words(session, user.id, limit=10)
-        
-        if not due_words:
-            text = (
-                "🎉 <b>Відмінна робота!</b>\n\n"
-                "Зараз немає слів для тренування.\n"
-                "Спробуй вивчити нові слова в режимі карток! 📚"
-            )
-            await callback.message.edit_text(
-                text,
-                reply_markup=get_main_menu_keyboard(),
-                parse_mode='HTML'
-            )
-            await callback.answer()
-            return
-        
-        # Save to state
-        await state.update_data(
-            user_id=user.id,
-            user_level=user.level,
-            due_words_count=len(due_words),
-            current_question=0,
-            correct_answers=0
+        # Load the whole session's words up front
+        due_words = await srs_service.get_due_batch(session, user.id, limit=10)
+    
+    if not due_words:
+        await callback.message.edit_text(
+            NO_WORDS_TEXT,
+            reply_markup=get_main_menu_keyboard(),
+            parse_mode='HTML'
         )
+        await callback.answer()
+        return
+    
+    # Save to state
+    await state.update_data(
+        user_id=user.id,
+        user_level=user.level,
+        due_words=due_words,
+        due_words_count=len(due_words),
+        current_question=0,
+        correct_answers=0
+    )
     
     await state.set_state(FillBlankTraining.show_question)
     
-    text = (
-        "📝 <b>Тренування з Пропусками</b>\n\n"
-        f"У тебе <b>{len(due_words)}</b> слово(ів) для тренування.\n\n"
-        "AI згенерує речення з пропуском, а ти обереш правильне слово.\n"
-        "Після відповіді отримаєш детальне пояснення українською! 🇺🇦\n\n"
-        "Готовий? 🚀"
-    )
+    # Questions are generated while the user reads the intro
+    prefetch_questions(callback.from_user.id, due_words, user.level)
     
-    from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="▶️ Почати Тренування", callback_data="show_fill_blank_question")],
-        [InlineKeyboardButton(text="🔙 Головне Меню", callback_data="main_menu")]
-    ])
+    text = START_TEMPLATE.format(count=len(due_words))
     
-    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode='HTML')
+    await callback.message.edit_text(text, reply_markup=START_TRAINING_KB, parse_mode='HTML')
     await callback.answer()
 
 
@@ -81,59 +163,51 @@ async def start_fill_blank_training(callback: CallbackQuery, state: FSMContext):
 async def show_fill_blank_question(callback: CallbackQuery, state: FSMContext):
     """Show fill-in-the-blank question."""
     data = await state.get_data()
+    due_words = data.get('due_words', [])
+    current_q = data.get('current_question', 0)
     
-    session_maker = models.get_session_maker()
-    async with session_maker() as session:
-        # Get due words
-        due_words = await srs_service.get_due_words(session, data['user_id'], limit=10)
-        
-        current_q = data.get('current_question', 0)
-        
-        if current_q >= len(due_words):
-            # Training complete
-            await complete_training(callback, state)
-            return
+    if current_q >= len(due_words):
+        # Training complete
+        await complete_training(callback, state)
+        return
+    
+    # Placeholder and callback ack run while the question is generated
+    placeholder = asyncio.gather(
+        callback.message.edit_text("⏳ Генерую питання...", parse_mode='HTML'),
+        callback.answer(),
+        return_exceptions=True
+    )
+    
+    user_level = data.get('user_level', 'A1')
+    
+    # Skip words whose question could not be generated
+    question_data = None
+    while current_q < len(due_words):
+        word = due_words[current_q]
         
-        progress = due_words[current_q]
+        # Generate fill-in-the-blank question with better explanation
+        question_data = await get_question(callback.from_user.id, word, user_level)
+        if question_data:
+            break
         
-        # Get word details
-        from models.models import Vocabulary
-        word_query = select(Vocabulary).where(Vocabulary.id == progress.word_id)
-        word_result = await session.execute(word_query)
-        word = word_result.scalar_one()
-    
-    await callback.message.edit_text("⏳ Генерую питання...", parse_mode='HTML')
-    await callback.answer()
+        await callback.message.answer("❌ Помилка генерації питання. Пропускаю...")
+        current_q += 1
     
-    # Generate fill-in-the-blank question with better explanation
-    question_data = await ai_service.generate_fill_in_blank(
-        word=word.word_polish,
-        translation_ua=word.translation_ua,
-        translation_ru=word.translation_ru,
-        user_level=data.get('user_level', 'A1')
-    )
+    await placeholder
     
     if not question_data:
-        await callback.message.answer("❌ Помилка генерації питання. Пропускаю...")
-        # Skip to next
-        await state.update_data(current_question=current_q + 1)
-        await show_fill_blank_question(callback, state)
+        await state.update_data(current_question=current_q)
+        await show_training_results(callback, state)
         return
     
     # Shuffle answers
-    answers = [
-        question_data.correct_answer,
-        question_data.distractor_1,
-        question_data.distractor_2,
-        question_data.distractor_3
-    ]
-    random.shuffle(answers)
-    correct_index = answers.index(question_data.correct_answer)
+    answers, correct_index = shuffle_answers(question_data)
     
     # Save to state
     await state.update_data(
-        progress_id=progress.id,
-        word_polish=word.word_polish,
+        current_question=current_q,
+        progress_id=word['progress_id'],
+        word_polish=word['word_polish'],
         question_sentence=question_data.sentence,
         fill_blank_answers=answers,
         fill_blank_correct_index=correct_index,
@@ -141,15 +215,17 @@ async def show_fill_blank_question(callback: CallbackQuery, state: FSMContext):
         total_questions=len(due_words)
     )
     
-    progress_text = f"Питання: {current_q + 1}/{len(due_words)}"
-    
     # Build question with Polish sentence and Ukrainian translation
-    question_text = f"📝 <b>{progress_text}</b>\n\n"
-    question_text += f"<i>{question_data.sentence}</i>\n"
+    parts = [
+        f"📝 <b>Питання: {current_q + 1}/{len(due_words)}</b>\n\n",
+        f"<i>{question_data.sentence}</i>\n"
+    ]
     
     # Add Ukrainian translation in spoiler if available
     if question_data.sentence_translation:
-        question_text += f"\n<tg-spoiler>🇺🇦 {question_data.sentence_translation}</tg-spoiler>"
+        parts.append(f"\n<tg-spoiler>🇺🇦 {question_data.sentence_translation}</tg-spoiler>")
+    
+    question_text = "".join(parts)
     
     await callback.message.answer(
         question_text,
@@ -158,18 +234,17 @@ async def show_fill_blank_question(callback: CallbackQuery, state: FSMContext):
     )
 
 
-@router.callback_query(F.data.startswith("fill_blank_"), FillBlankTraining.show_question)
+@router.callback_query(F.data.in_(ANSWER_INDEX), FillBlankTraining.show_question)
 async def answer_fill_blank(callback: CallbackQuery, state: FSMContext):
     """Handle fill-in-the-blank answer."""
-    answer_index = int(callback.data.split("_")[2])
+    answer_index = ANSWER_INDEX[callback.data]
     data = await state.get_data()
     
     is_correct = (answer_index == data['fill_blank_correct_index'])
     
-    # Update SRS progress
-    session_maker = models.get_session_maker()
-    async with session_maker() as session:
-        quality = 4 if is_correct else 1
+    # Update SRS progress (one session and commit per answer)
+    quality = 4 if is_correct else 1
+    async with SessionLocal() as session:
         await srs_service.update_progress(
             session=session,
             progress_id=data['progress_id'],
@@ -177,12 +252,6 @@ async def answer_fill_blank(callback: CallbackQuery, state: FSMContext):
             is_correct=is_correct
         )
     
-    # Update stats
-    if is_correct:
-        await state.update_data(correct_answers=data.get('correct_answers', 0) + 1)
-    
-    await state.set_state(FillBlankTraining.show_result)
-    
     if is_correct:
         feedback = (
             "✅ <b>Правильно!</b> Świetnie! 🎉\n\n"
@@ -197,22 +266,14 @@ async def answer_fill_blank(callback: CallbackQuery, state: FSMContext):
             f"<b>Пояснення:</b>\n<i>{data['fill_blank_explanation']}</i>"
         )
     
-    # Move to next question
+    # Move to next question (single state write)
     current_q = data.get('current_question', 0) + 1
-    await state.update_data(current_question=current_q)
-    
-    from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+    await state.update_data(
+        correct_answers=data.get('correct_answers', 0) + int(is_correct),
+        current_question=current_q
+    )
     
-    if current_q < data['total_questions']:
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="➡️ Наступне Питання", callback_data="next_fill_blank")],
-            [InlineKeyboardButton(text="🔙 Головне Меню", callback_data="main_menu")]
-        ])
-    else:
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="✅ Завершити Тренування", callback_data="complete_fill_blank")],
-            [InlineKeyboardButton(text="🔙 Головне Меню", callback_data="main_menu")]
-        ])
+    keyboard = NEXT_QUESTION_KB if current_q < data['total_questions'] else COMPLETE_TRAINING_KB
     
     await state.set_state(FillBlankTraining.show_question)
     
@@ -227,25 +288,21 @@ async def answer_fill_blank(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(F.data == "complete_fill_blank")
 async def complete_training(callback: CallbackQuery, state: FSMContext):
     """Complete training session and show results."""
+    await show_training_results(callback, state)
+    await callback.answer()
+
+
+async def show_training_results(callback: CallbackQuery, state: FSMContext):
+    """Show session results."""
+    cancel_prefetch(callback.from_user.id)
     data = await state.get_data()
     
     total = data.get('total_questions', 0)
     correct = data.get('correct_answers', 0)
     percentage = (correct / total * 100) if total > 0 else 0
     
-    text = (
-        "🎉 <b>Тренування Завершено!</b>\n\n"
-        f"📊 <b>Результати:</b>\n"
-        f"   Правильних відповідей: <b>{correct}/{total}</b>\n"
-        f"   Відсоток: <b>{percentage:.1f}%</b>\n\n"
-    )
-    
-    if percentage >= 80:
-        text += "🌟 Відмінна робота! Ти молодець!"
-    elif percentage >= 60:
-        text += "👍 Добре! Продовжуй навчання!"
-    else:
-        text += "💪 Не здавайся! Практика – шлях до успіху!"
+    verdict = next(msg for threshold, msg in VERDICTS if percentage >= threshold)
+    text = RESULTS_TEMPLATE.format(correct=correct, total=total, percentage=percentage, verdict=verdict)
     
     await state.set_state(MainMenu.menu)
     await callback.message.edit_text(
@@ -253,4 +310,3 @@ async def complete_training(callback: CallbackQuery, state: FSMContext):
         reply_markup=get_main_menu_keyboard(),
         parse_mode='HTML'
     )
-    await callback.answer()
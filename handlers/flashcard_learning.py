@@ -1,13 +1,15 @@
 """Handlers for flashcard-based vocabulary learning."""
 
 from aiogram import Router, F
-from aiogram.types import CallbackQuery
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
-from sqlalchemy import select
+from sqlalchemy import delete
 
-from models import models
-from models.models import User
+from models.models import SessionLocal, ReadSessionLocal
 from utils.states import FlashcardLearning, MainMenu
+from utils.callbacks import answer_early
+from utils.user_cache import get_user
+from utils.vocab_page_cache import invalidate_vocab_pages
 from utils.keyboards import (
     get_flashcard_word_keyboard,
     get_flashcard_feedback_keyboard,
@@ -17,16 +19,36 @@ from services.flashcard_service import flashcard_service
 
 router = Router()
 
+SEPARATOR = "➖➖➖➖➖➖➖➖"
+
+NO_WORDS_TEXT = (
+    "🎉 <b>Вітаю!</b>\n\nЗараз немає слів для вивчення!\n\n"
+    "Спробуй пізніше або додай нові слова."
+)
+
+START_TEMPLATE = (
+    "📚 <b>Вивчення Слів (Картки)</b>\n\n"
+    "📊 <b>Твоя Статистика:</b>\n"
+    "   ✅ Знаю: {known_words}\n"
+    "   📖 Вивчаю: {learning_words}\n"
+    "   🆕 Нові: {new_words}\n\n"
+    "Натискай на кнопку щоб показати переклад, потім обери чи знаєш ти це слово.\n\n"
+    "Готовий почати? 🚀"
+)
+
+ALL_DONE_TEXT = "🎉 <b>Відмінно!</b>\n\nВсі слова на сьогодні вивчено!"
+
+START_LEARNING_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="▶️ Почати Навчання", callback_data="flashcard_show_next")],
+    [InlineKeyboardButton(text="🔙 Головне Меню", callback_data="main_menu")]
+])
+
 
 @router.callback_query(F.data == "flashcard_learning")
 async def start_flashcard_learning(callback: CallbackQuery, state: FSMContext):
     """Start flashcard learning session."""
-    session_maker = models.get_session_maker()
-    async with session_maker() as session:
-        # Get user
-        query = select(User).where(User.telegram_id == callback.from_user.id)
-        result = await session.execute(query)
-        user = result.scalar_one_or_none()
+    async with ReadSessionLocal() as session:
+        user = await get_user(session, callback.from_user.id)
         
         if not user:
             await callback.answer("❌ Помилка: користувач не знайдений!", show_alert=True)
@@ -36,56 +58,50 @@ async def start_flashcard_learning(callback: CallbackQuery, state: FSMContext):
         stats = await flashcard_service.get_learning_stats(session, user.id)
     
     await state.set_state(FlashcardLearning.show_word)
+    await state.update_data(session_seen_count=0, session_error_count=0)
     
-    text = (
-        "📚 <b>Вивчення Слів (Картки)</b>\n\n"
-        f"📊 <b>Твоя Статистика:</b>\n"
-        f"   ✅ Знаю: {stats['known_words']}\n"
-        f"   📖 Вивчаю: {stats['learning_words']}\n"
-        f"   🆕 Нові: {stats['new_words']}\n\n"
-        "Натискай на кнопку щоб показати переклад, потім обери чи знаєш ти це слово.\n\n"
-        "Готовий почати? 🚀"
-    )
-    
-    from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="▶️ Почати Навчання", callback_data="flashcard_show_next")],
-        [InlineKeyboardButton(text="🔙 Головне Меню", callback_data="main_menu")]
-    ])
+    text = START_TEMPLATE.format_map(stats)
     
-    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode='HTML')
+    await callback.message.edit_text(text, reply_markup=START_LEARNING_KB, parse_mode='HTML')
     await callback.answer()
 
 
-@router.callback_query(F.data == "flashcard_show_next")
-@router.callback_query(F.data == "flashcard_next")
-async def show_next_word(callback: CallbackQuery, state: FSMContext):
-    """Show next word card."""
-    session_maker = models.get_session_maker()
-    async with session_maker() as session:
-        # Get user
-        query = select(User).where(User.telegram_id == callback.from_user.id)
-        result = await session.execute(query)
-        user = result.scalar_one_or_none()
+async def send_next_word(
+    callback: CallbackQuery,
+    state: FSMContext,
+    done_text: str,
+    changes: dict = None
+) -> bool:
+    """
+    Pick next word for user and show its card.
+    
+    Args:
+        changes: Extra FSM data saved together with the new word
+    
+    Returns:
+        False if there are no words left (done_text is shown instead)
+    """
+    async with SessionLocal() as session:
+        user = await get_user(session, callback.from_user.id)
         
         # Get next word
         word_data = await flashcard_service.get_next_word_for_user(session, user.id)
         
         if not word_data:
+            if changes:
+                await state.update_data(**changes)
             await callback.message.edit_text(
-                "🎉 <b>Вітаю!</b>\n\nЗараз немає слів для вивчення!\n\n"
-                "Спробуй пізніше або додай нові слова.",
+                done_text,
                 reply_markup=get_main_menu_keyboard(),
                 parse_mode='HTML'
             )
-            await state.set_state(MainMenu.menu)
-            await callback.answer()
-            return
+            return False
         
         word, stats = word_data
         
         # Save to state
         await state.update_data(
+            **(changes or {}),
             current_word_id=word.id,
             current_stats_id=stats.id,
             word_polish=word.word_polish,
@@ -98,14 +114,29 @@ async def show_next_word(callback: CallbackQuery, state: FSMContext):
     
     # Show word card with visual separators
     emoji = word.emoji if word.emoji else "📝"
-    text = f"➖➖➖➖➖➖➖➖\n\n{emoji} <b>{word.word_polish}</b>\n\n➖➖➖➖➖➖➖➖"
+    text = f"{SEPARATOR}\n\n{emoji} <b>{word.word_polish}</b>\n\n{SEPARATOR}"
     
     await callback.message.edit_text(
         text,
         reply_markup=get_flashcard_word_keyboard(),
         parse_mode='HTML'
     )
-    await callback.answer()
+    return True
+
+
+@router.callback_query(F.data == "flashcard_show_next")
+@router.callback_query(F.data == "flashcard_next")
+async def show_next_word(callback: CallbackQuery, state: FSMContext):
+    """Show next word card."""
+    answer_early(callback)
+    await continue_flashcards(callback, state)
+
+
+async def continue_flashcards(callback: CallbackQuery, state: FSMContext):
+    """Show next word card (callback is acknowledged by the caller)."""
+    found = await send_next_word(callback, state, NO_WORDS_TEXT)
+    if not found:
+        await state.set_state(MainMenu.menu)
 
 
 @router.callback_query(F.data == "show_translation", FlashcardLearning.show_word)
@@ -117,14 +148,17 @@ async def show_translation(callback: CallbackQuery, state: FSMContext):
     
     # Build text with visual separators
     emoji = data.get('word_emoji') or "📝"
-    text = f"➖➖➖➖➖➖➖➖\n\n"
-    text += f"{emoji} 🇵🇱 <b>{data['word_polish']}</b>\n"
-    text += f"    🇺🇦 <b>{data['word_ukrainian']}</b>\n\n"
+    parts = [
+        SEPARATOR, "\n\n",
+        f"{emoji} 🇵🇱 <b>{data['word_polish']}</b>\n",
+        f"    🇺🇦 <b>{data['word_ukrainian']}</b>\n\n"
+    ]
     
     if data.get('word_example'):
-        text += f"<i>{data['word_example']}</i>\n\n"
+        parts.append(f"<i>{data['word_example']}</i>\n\n")
     
-    text += "➖➖➖➖➖➖➖➖"
+    parts.append(SEPARATOR)
+    text = "".join(parts)
     
     await callback.message.edit_text(
         text,
@@ -141,8 +175,7 @@ async def handle_know_button(callback: CallbackQuery, state: FSMContext):
     
     # If state is missing (e.g. bot restarted), just skip stats update and go to next word
     if data.get('current_stats_id'):
-        session_maker = models.get_session_maker()
-        async with session_maker() as session:
+        async with SessionLocal() as session:
             await flashcard_service.update_word_stats(
                 session,
                 stats_id=data['current_stats_id'],
@@ -150,50 +183,14 @@ async def handle_know_button(callback: CallbackQuery, state: FSMContext):
             )
             
         # Track session
-        session_words = data.get('session_words', [])
-        session_words.append(data['current_word_id'])
-        await state.update_data(session_words=session_words)
+        changes = {'session_seen_count': data.get('session_seen_count', 0) + 1}
+    else:
+        changes = None
     
     await callback.answer("✅")
     
-    # Go to next word - use new message for reliable display
-    await state.set_state(FlashcardLearning.show_word)
-    
-    # Get and show next word directly
-    async with session_maker() as session:
-        query = select(User).where(User.telegram_id == callback.from_user.id)
-        result = await session.execute(query)
-        user = result.scalar_one_or_none()
-        
-        word_data = await flashcard_service.get_next_word_for_user(session, user.id)
-        
-        if not word_data:
-            await callback.message.edit_text(
-                "🎉 <b>Відмінно!</b>\n\nВсі слова на сьогодні вивчено!",
-                reply_markup=get_main_menu_keyboard(),
-                parse_mode='HTML'
-            )
-            return
-        
-        word, stats = word_data
-        
-        await state.update_data(
-            current_word_id=word.id,
-            current_stats_id=stats.id,
-            word_polish=word.word_polish,
-            word_ukrainian=word.translation_ua,
-            word_example=word.example_sentence_pl,
-            word_emoji=word.emoji
-        )
-    
-    emoji = word.emoji if word.emoji else "📝"
-    text = f"➖➖➖➖➖➖➖➖\n\n{emoji} <b>{word.word_polish}</b>\n\n➖➖➖➖➖➖➖➖"
-    
-    await callback.message.edit_text(
-        text,
-        reply_markup=get_flashcard_word_keyboard(),
-        parse_mode='HTML'
-    )
+    # Go to next word (session tracking saved in the same state write)
+    await send_next_word(callback, state, ALL_DONE_TEXT, changes)
 
 
 @router.callback_query(F.data == "flashcard_dont_know")
@@ -203,8 +200,7 @@ async def handle_dont_know_button(callback: CallbackQuery, state: FSMContext):
     
     # If state is missing (e.g. bot restarted), just skip stats update and go to next word
     if data.get('current_stats_id'):
-        session_maker = models.get_session_maker()
-        async with session_maker() as session:
+        async with SessionLocal() as session:
             await flashcard_service.update_word_stats(
                 session,
                 stats_id=data['current_stats_id'],
@@ -212,55 +208,17 @@ async def handle_dont_know_button(callback: CallbackQuery, state: FSMContext):
             )
         
         # Track session errors
-        session_words = data.get('session_words', [])
-        session_errors = data.get('session_errors', [])
-        session_words.append(data['current_word_id'])
-        session_errors.append(data['current_word_id'])
-        
-        await state.update_data(
-            session_words=session_words,
-            session_errors=session_errors
-        )
+        changes = {
+            'session_seen_count': data.get('session_seen_count', 0) + 1,
+            'session_error_count': data.get('session_error_count', 0) + 1
+        }
+    else:
+        changes = None
     
     await callback.answer("📝")
     
-    # Go to next word - inline logic for reliability
-    await state.set_state(FlashcardLearning.show_word)
-    
-    async with session_maker() as session:
-        query = select(User).where(User.telegram_id == callback.from_user.id)
-        result = await session.execute(query)
-        user = result.scalar_one_or_none()
-        
-        word_data = await flashcard_service.get_next_word_for_user(session, user.id)
-        
-        if not word_data:
-            await callback.message.edit_text(
-                "🎉 <b>Відмінно!</b>\n\nВсі слова на сьогодні вивчено!",
-                reply_markup=get_main_menu_keyboard(),
-                parse_mode='HTML'
-            )
-            return
-        
-        word, stats = word_data
-        
-        await state.update_data(
-            current_word_id=word.id,
-            current_stats_id=stats.id,
-            word_polish=word.word_polish,
-            word_ukrainian=word.translation_ua,
-            word_example=word.example_sentence_pl,
-            word_emoji=word.emoji
-        )
-    
-    emoji = word.emoji if word.emoji else "📝"
-    text = f"➖➖➖➖➖➖➖➖\n\n{emoji} <b>{word.word_polish}</b>\n\n➖➖➖➖➖➖➖➖"
-    
-    await callback.message.edit_text(
-        text,
-        reply_markup=get_flashcard_word_keyboard(),
-        parse_mode='HTML'
-    )
+    # Go to next word (session tracking saved in the same state write)
+    await send_next_word(callback, state, ALL_DONE_TEXT, changes)
 
 
 @router.callback_query(F.data == "flashcard_delete")
@@ -273,25 +231,22 @@ async def delete_word_from_learning(callback: CallbackQuery, state: FSMContext):
         await callback.answer("❌ Помилка", show_alert=True)
         return
     
-    session_maker = models.get_session_maker()
-    async with session_maker() as session:
-        user_query = select(User).where(User.telegram_id == callback.from_user.id)
-        user_result = await session.execute(user_query)
-        user = user_result.scalar_one_or_none()
+    async with SessionLocal() as session:
+        user = await get_user(session, callback.from_user.id)
         
         from models.models import WordLearningStats
-        stats_query = select(WordLearningStats).where(
+        # Single DELETE statement, no need to load the row first
+        stats_query = delete(WordLearningStats).where(
             WordLearningStats.user_id == user.id,
             WordLearningStats.word_id == word_id
         )
         stats_result = await session.execute(stats_query)
-        stats = stats_result.scalar_one_or_none()
+        await session.commit()
         
-        if stats:
-            await session.delete(stats)
-            await session.commit()
+        if stats_result.rowcount:
+            invalidate_vocab_pages(user.id)
             await callback.answer("🗑️ Видалено!", show_alert=True)
             # Show next word
-            await show_next_word(callback, state)
+            await continue_flashcards(callback, state)
         else:
             await callback.answer("❌ Не знайдено", show_alert=True)
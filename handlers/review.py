@@ -1,120 +1,182 @@
 """Handlers for SRS (Spaced Repetition System) review."""
 
-import random
+import asyncio
+
 from aiogram import Router, F
-from aiogram.types import CallbackQuery
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
-from sqlalchemy import select
 
-from models import models
-from models.models import User, UserProgress, Vocabulary
+from models.models import SessionLocal, ReadSessionLocal
 from utils.states import SRSReview, MainMenu
+from utils.callbacks import answer_early
+from utils.user_cache import get_user
 from utils.keyboards import (
+    get_answer_index_map,
     get_review_start_keyboard,
     get_quiz_keyboard,
     get_main_menu_keyboard
 )
 from services.srs_service import srs_service
-from services.ai_service import ai_service
+from services.ai_service import shuffle_answers, BackgroundGeneration
+from handlers.fill_blank_training import generate_question
 
 router = Router()
 
+# Callback data of quiz answer buttons -> answer index
+ANSWER_INDEX = get_answer_index_map("review")
+
+NO_DUE_WORDS_TEXT = (
+    "🎉 <b>Відмінна робота!</b>\n\n"
+    "Зараз немає слів для повторення. Усі твої слова актуальні!\n\n"
+    "Спробуй вивчити нові слова в Режимі Виживання. 🎯"
+)
+
+START_TEMPLATE = (
+    "📚 <b>Час Повторення!</b>\n\n"
+    "У тебе <b>{due_count}</b> слово(ів) для повторення.\n\n"
+    "Тримай свій словник свіжим! 💪"
+)
+
+NEXT_WORD_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="➡️ Next Word", callback_data="start_review")]
+])
+
+COMPLETE_SESSION_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="✅ Complete Session", callback_data="complete_review")]
+])
+
+# telegram_id -> (word_id, background generation of the next due word's question)
+_next_questions: dict[int, tuple[int, BackgroundGeneration]] = {}
+
+
+def prefetch_next_question(telegram_id: int, word: dict, user_level: str):
+    """Start generating the next question while the user answers the current one."""
+    cancel_next_question(telegram_id)
+    _next_questions[telegram_id] = (word['word_id'], BackgroundGeneration(generate_question(word, user_level)))
+
+
+def has_next_question(telegram_id: int) -> bool:
+    """Check whether user has a prefetched question."""
+    return telegram_id in _next_questions
+
+
+def cancel_next_question(telegram_id: int):
+    """Drop pending prefetched question for user."""
+    entry = _next_questions.pop(telegram_id, None)
+    if entry:
+        entry[1].cancel()
+
+
+async def get_review_question(telegram_id: int, word: dict, user_level: str):
+    """Get question for word, reusing the prefetched one when it matches."""
+    entry = _next_questions.get(telegram_id)
+    if entry and entry[0] == word['word_id']:
+        del _next_questions[telegram_id]
+        try:
+            question_data = await entry[1].result()
+            if question_data:
+                return question_data
+        except Exception as e:
+            print(f"⚠️ Prefetched question failed, regenerating: {e}")
+    
+    return await generate_question(word, user_level)
+
 
 @router.callback_query(F.data == "review_words")
 async def start_review(callback: CallbackQuery, state: FSMContext):
     """Start SRS review session."""
-    session_maker = models.get_session_maker()
-    async with session_maker() as session:
-        # Get user
-        query = select(User).where(User.telegram_id == callback.from_user.id)
-        result = await session.execute(query)
-        user = result.scalar_one_or_none()
+    answer_early(callback)
+    
+    async with ReadSessionLocal() as session:
+        user = await get_user(session, callback.from_user.id)
         
-        # Get due words
-        due_words = await srs_service.get_due_words(session, user.id)
-        due_count = len(due_words)
+        # Only the count is shown here; words are loaded when the review starts
+        due_count = await srs_service.get_due_count(session, user.id)
     
     if due_count == 0:
-        text = (
-            "🎉 <b>Відмінна робота!</b>\n\n"
-            "Зараз немає слів для повторення. Усі твої слова актуальні!\n\n"
-            "Спробуй вивчити нові слова в Режимі Виживання. 🎯"
-        )
-    else:
-        text = (
-            f"📚 <b>Час Повторення!</b>\n\n"
-            f"У тебе <b>{due_count}</b> слово(ів) для повторення.\n\n"
-            "Тримай свій словник свіжим! 💪"
+        # Nothing to review: no session data needed
+        await state.set_state(MainMenu.menu)
+        await callback.message.edit_text(
+            NO_DUE_WORDS_TEXT,
+            reply_markup=get_review_start_keyboard(0),
+            parse_mode='HTML'
         )
+        return
+    
+    text = START_TEMPLATE.format(due_count=due_count)
     
-    await state.update_data(user_id=user.id, due_count=due_count, current_index=0)
+    # review_words is loaded on the first question of the session
+    await state.update_data(user_id=user.id, due_count=due_count, current_index=0, review_words=None)
     
     await callback.message.edit_text(
         text,
         reply_markup=get_review_start_keyboard(due_count),
         parse_mode='HTML'
     )
-    await callback.answer()
 
 
 @router.callback_query(F.data == "start_review")
 async def show_review_question(callback: CallbackQuery, state: FSMContext):
     """Show next review question."""
+    answer_early(callback)
+    await send_review_question(callback, state)
+
+
+async def send_review_question(callback: CallbackQuery, state: FSMContext):
+    """Show review question at current_index (callback is acknowledged by the caller)."""
     data = await state.get_data()
     current_index = data.get('current_index', 0)
     
-    session_maker = models.get_session_maker()
-    async with session_maker() as session:
-        # Get due words
-        due_words = await srs_service.get_due_words(session, data['user_id'])
-        
-        if current_index >= len(due_words):
-            # Session complete
-            await complete_review_session(callback, state)
-            return
-        
-        progress = due_words[current_index]
-        
-        # Get word details
-        word_query = select(Vocabulary).where(Vocabulary.id == progress.word_id)
-        word_result = await session.execute(word_query)
-        word = word_result.scalar_one()
+    due_words = data.get('review_words')
+    
+    # Load the session's words once; later questions are read from state
+    if due_words is None:
+        async with ReadSessionLocal() as session:
+            due_words = await srs_service.get_due_batch(session, data['user_id'])
+        await state.update_data(review_words=due_words)
+    
+    if current_index >= len(due_words):
+        # Session complete
+        await finish_review_session(callback, state)
+        return
+    
+    word = due_words[current_index]
+    
+    user_level = data.get('user_level', 'A1')
     
     await state.set_state(SRSReview.review_active)
-    await callback.message.edit_text("⏳ Генерую питання...")
-    await callback.answer()
-    
-    # Generate fill-in-the-blank question
-    question_data = await ai_service.generate_fill_in_blank(
-        word=word.word_polish,
-        translation_ua=word.translation_ua,
-        translation_ru=word.translation_ru,
-        user_level=data.get('user_level', 'A1')
+    
+    # Placeholder is sent while the question is generated (edit errors are ignored)
+    placeholder = asyncio.gather(
+        callback.message.edit_text("⏳ Генерую питання..."),
+        return_exceptions=True
     )
     
+    # Generate fill-in-the-blank question (reuses the one prefetched for this word)
+    question_data = await get_review_question(callback.from_user.id, word, user_level)
+    
+    # Generate the following question while this one is answered
+    if current_index + 1 < len(due_words):
+        prefetch_next_question(callback.from_user.id, due_words[current_index + 1], user_level)
+    
+    await placeholder
+    
     if not question_data:
         await callback.message.answer(
             "❌ Помилка генерації питання. Пропускаю...",
         )
         # Skip to next word
         await state.update_data(current_index=current_index + 1)
-        await show_review_question(callback, state)
+        await send_review_question(callback, state)
         return
     
     # Shuffle answers
-    answers = [
-        question_data.correct_answer,
-        question_data.distractor_1,
-        question_data.distractor_2,
-        question_data.distractor_3
-    ]
-    random.shuffle(answers)
-    correct_index = answers.index(question_data.correct_answer)
+    answers, correct_index = shuffle_answers(question_data)
     
     # Save to state
     await state.update_data(
-        progress_id=progress.id,
-        word_polish=word.word_polish,
+        progress_id=word['progress_id'],
+        word_polish=word['word_polish'],
         question_sentence=question_data.sentence,
         review_answers=answers,
         review_correct_index=correct_index,
@@ -136,10 +198,12 @@ async def show_review_question(callback: CallbackQuery, state: FSMContext):
     )
 
 
-@router.callback_query(F.data.startswith("review_"), SRSReview.review_active)
+@router.callback_query(F.data.in_(ANSWER_INDEX), SRSReview.review_active)
 async def answer_review(callback: CallbackQuery, state: FSMContext):
     """Handle review answer."""
-    answer_index = int(callback.data.split("_")[1])
+    answer_early(callback)
+    
+    answer_index = ANSWER_INDEX[callback.data]
     data = await state.get_data()
     
     is_correct = (answer_index == data['review_correct_index'])
@@ -150,9 +214,8 @@ async def answer_review(callback: CallbackQuery, state: FSMContext):
     else:
         quality = 1  # Incorrect but familiar
     
-    # Update SRS progress
-    session_maker = models.get_session_maker()
-    async with session_maker() as session:
+    # Update SRS progress (one session and commit per answer)
+    async with SessionLocal() as session:
         await srs_service.update_progress(
             session=session,
             progress_id=data['progress_id'],
@@ -179,29 +242,25 @@ async def answer_review(callback: CallbackQuery, state: FSMContext):
     current_index = data.get('current_index', 0) + 1
     await state.update_data(current_index=current_index)
     
-    keyboard = get_main_menu_keyboard() if current_index >= data['total_words'] else None
-    
-    if current_index < data['total_words']:
-        from utils.keyboards import InlineKeyboardMarkup, InlineKeyboardButton
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="➡️ Next Word", callback_data="start_review")]
-        ])
-    else:
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="✅ Complete Session", callback_data="complete_review")]
-        ])
+    keyboard = NEXT_WORD_KB if current_index < data['total_words'] else COMPLETE_SESSION_KB
     
     await callback.message.edit_text(
         feedback,
         reply_markup=keyboard,
         parse_mode='HTML'
     )
-    await callback.answer()
 
 
 @router.callback_query(F.data == "complete_review")
 async def complete_review_session(callback: CallbackQuery, state: FSMContext):
     """Complete review session and show results."""
+    answer_early(callback)
+    await finish_review_session(callback, state)
+
+
+async def finish_review_session(callback: CallbackQuery, state: FSMContext):
+    """Show review results (callback is acknowledged by the caller)."""
+    cancel_next_question(callback.from_user.id)
     data = await state.get_data()
     
     text = (
@@ -216,4 +275,3 @@ async def complete_review_session(callback: CallbackQuery, state: FSMContext):
         reply_markup=get_main_menu_keyboard(),
         parse_mode='HTML'
     )
-    await callback.answer()
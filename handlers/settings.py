@@ -3,12 +3,13 @@
 from aiogram import Router, F
 from aiogram.types import CallbackQuery
 from aiogram.fsm.context import FSMContext
-from sqlalchemy import select
+from sqlalchemy import update
 
-from models import models
-from models.models import User
+from models.models import SessionLocal, ReadSessionLocal, User
 from utils.states import Settings, MainMenu
+from utils.callbacks import answer_early, LevelCB
 from utils.keyboards import get_settings_keyboard, get_level_selection_keyboard
+from utils.user_cache import get_user, cache_user
 
 router = Router()
 
@@ -16,11 +17,14 @@ router = Router()
 @router.callback_query(F.data == "settings")
 async def show_settings(callback: CallbackQuery, state: FSMContext):
     """Show settings menu."""
-    session_maker = models.get_session_maker()
-    async with session_maker() as session:
-        query = select(User).where(User.telegram_id == callback.from_user.id)
-        result = await session.execute(query)
-        user = result.scalar_one_or_none()
+    answer_early(callback)
+    await send_settings(callback, state)
+
+
+async def send_settings(callback: CallbackQuery, state: FSMContext):
+    """Show settings menu (callback is acknowledged by the caller)."""
+    async with ReadSessionLocal() as session:
+        user = await get_user(session, callback.from_user.id)
     
     await state.set_state(Settings.main)
     
@@ -31,7 +35,6 @@ async def show_settings(callback: CallbackQuery, state: FSMContext):
         reply_markup=get_settings_keyboard(user.level),
         parse_mode='HTML'
     )
-    await callback.answer()
 
 
 @router.callback_query(F.data == "change_level", Settings.main)
@@ -55,36 +58,42 @@ async def change_level_menu(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("level_"), Settings.change_level)
-async def set_level(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(LevelCB.filter(), Settings.change_level)
+async def set_level(callback: CallbackQuery, callback_data: LevelCB, state: FSMContext):
     """Set user level."""
-    level = callback.data.split("_")[1]  # A1, A2, or B1
+    level = callback_data.level  # A1, A2, or B1
     
-    session_maker = models.get_session_maker()
-    async with session_maker() as session:
-        query = select(User).where(User.telegram_id == callback.from_user.id)
+    async with SessionLocal() as session:
+        # Single UPDATE ... RETURNING, no need to load the user row first
+        query = (
+            update(User)
+            .where(User.telegram_id == callback.from_user.id)
+            .values(level=level)
+            .returning(User.id, User.level, User.streak_days)
+        )
         result = await session.execute(query)
-        user = result.scalar_one_or_none()
-        
-        user.level = level
+        user = result.first()
         await session.commit()
     
+    # Refresh cached user so show_settings needs no query
+    if user:
+        cache_user(callback.from_user.id, user)
+    
     await state.set_state(MainMenu.menu)
     
     await callback.answer(f"✅ Рівень змінено на {level}", show_alert=True)
-    await show_settings(callback, state)
+    await send_settings(callback, state)
 
 
 @router.callback_query(F.data == "my_progress")
 async def show_progress(callback: CallbackQuery, state: FSMContext):
     """Show user progress and statistics."""
+    answer_early(callback)
+    
     from services.srs_service import srs_service
     
-    session_maker = models.get_session_maker()
-    async with session_maker() as session:
-        query = select(User).where(User.telegram_id == callback.from_user.id)
-        result = await session.execute(query)
-        user = result.scalar_one_or_none()
+    async with ReadSessionLocal() as session:
+        user = await get_user(session, callback.from_user.id)
         
         stats = await srs_service.get_review_stats(session, user.id)
     
@@ -108,4 +117,3 @@ async def show_progress(callback: CallbackQuery, state: FSMContext):
         reply_markup=get_main_menu_keyboard(),
         parse_mode='HTML'
     )
-    await callback.answer()
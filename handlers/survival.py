@@ -1,53 +1,111 @@
 """Handlers for Survival Mode (scenario-based learning)."""
 
+import re
 import json
-import random
+import asyncio
 from aiogram import Router, F
-from aiogram.types import CallbackQuery, FSInputFile
+from aiogram.types import CallbackQuery, Message, FSInputFile
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
-from sqlalchemy import select
+from sqlalchemy import select, update
 
-from models import models
-from models.models import User, Situation, UserQuizHistory
+from models.models import SessionLocal, ReadSessionLocal, Situation
 from utils.states import SurvivalMode, MainMenu
+from utils.callbacks import answer_early, ScenarioCB
+from utils.user_cache import get_user
+from utils.scenario_cache import get_scenarios
+from utils.vocab_page_cache import invalidate_vocab_pages
 from utils.keyboards import (
+    get_answer_index_map,
     get_scenario_selection_keyboard,
     get_quiz_keyboard,
     get_continue_keyboard,
     get_main_menu_keyboard
 )
-from services.ai_service import ai_service
+from services.ai_service import ai_service, shuffle_answers
 from services.tts_service import tts_service
+from services.history_writer import history_writer
 
 router = Router()
 
+# Callback data of quiz answer buttons -> answer index
+ANSWER_INDEX = get_answer_index_map("quiz")
+
+VOCAB_PREVIEW_TEMPLATE = (
+    "📚 <b>Словник для цього сценарію:</b>\n\n"
+    "{words}\n\n"
+    "Запам'ятай ці слова, вони зараз знадобляться!"
+)
+
+# Scenario vocabulary item "Polish (Ukrainian)" or just "Polish"
+VOCAB_ITEM_RE = re.compile(r"\s*([^(]*?)\s*(?:\((?:\s*([^()]*?)\s*\))?.*)?$", re.S)
+
+AUDIO_CAPTION = "🎧"
+
+# Intro audio sends in flight (referenced so they aren't garbage collected)
+_audio_tasks: set[asyncio.Task] = set()
+
+# telegram_id -> (generate_quiz arguments, task generating the quiz while the intro is shown)
+_pending_quizzes: dict[int, tuple[dict, asyncio.Task]] = {}
+
+
+def quiz_kwargs(data: dict, difficulty: str = "normal") -> dict:
+    """Build generate_quiz arguments from scenario data saved in state."""
+    return dict(
+        situation=data['scenario_title'],
+        situation_description=data['scenario_context'],
+        user_level=data['scenario_level'],
+        difficulty=difficulty,
+        target_vocabulary=data.get('scenario_vocabulary', [])
+    )
+
+
+def prefetch_quiz(telegram_id: int, data: dict):
+    """Start generating the quiz while the user reads the scenario intro."""
+    cancel_pending_quiz(telegram_id)
+    kwargs = quiz_kwargs(data)
+    task = asyncio.create_task(ai_service.generate_quiz(**kwargs))
+    _pending_quizzes[telegram_id] = (kwargs, task)
+
+
+def cancel_pending_quiz(telegram_id: int):
+    """Drop pending prefetched quiz for user."""
+    entry = _pending_quizzes.pop(telegram_id, None)
+    if entry and not entry[1].done():
+        entry[1].cancel()
+
+
+async def get_quiz(telegram_id: int, data: dict, difficulty: str = "normal"):
+    """Get quiz for scenario, reusing the prefetched one when it matches."""
+    kwargs = quiz_kwargs(data, difficulty)
+    
+    entry = _pending_quizzes.get(telegram_id)
+    if entry and entry[0] == kwargs:
+        del _pending_quizzes[telegram_id]
+        try:
+            quiz = await entry[1]
+            if quiz:
+                return quiz
+        except Exception as e:
+            print(f"⚠️ Prefetched quiz failed, regenerating: {e}")
+    else:
+        cancel_pending_quiz(telegram_id)
+    
+    return await ai_service.generate_quiz(**kwargs)
+
 
 @router.callback_query(F.data == "survival_mode")
 async def start_survival_mode(callback: CallbackQuery, state: FSMContext):
     """Start survival mode - show scenario selection."""
-    session_maker = models.get_session_maker()
-    async with session_maker() as session:
-        # Get user
-        query = select(User).where(User.telegram_id == callback.from_user.id)
-        result = await session.execute(query)
-        user = result.scalar_one_or_none()
+    async with ReadSessionLocal() as session:
+        user = await get_user(session, callback.from_user.id)
         
         # Get scenarios for user's level
-        scenarios_query = select(Situation).where(
-            Situation.is_active == True,
-            Situation.level <= user.level
-        )
-        scenarios_result = await session.execute(scenarios_query)
-        scenarios = scenarios_result.scalars().all()
+        scenarios_data = await get_scenarios(session, user.level)
         
-        if not scenarios:
+        if not scenarios_data:
             await callback.answer("Сценаріїв поки немає!", show_alert=True)
             return
-        
-        scenarios_data = [
-            {"id": s.id, "title": s.title, "level": s.level}
-            for s in scenarios
-        ]
     
     await state.set_state(SurvivalMode.select_scenario)
     
@@ -65,24 +123,21 @@ async def start_survival_mode(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("scenario_"), SurvivalMode.select_scenario)
-async def select_scenario(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(ScenarioCB.filter(), SurvivalMode.select_scenario)
+async def select_scenario(callback: CallbackQuery, callback_data: ScenarioCB, state: FSMContext):
     """Handle scenario selection."""
-    scenario_id = int(callback.data.split("_")[1])
-    
-    session_maker = models.get_session_maker()
-    async with session_maker() as session:
-        # Get scenario
-        query = select(Situation).where(Situation.id == scenario_id)
-        result = await session.execute(query)
-        scenario = result.scalar_one_or_none()
+    scenario_id = callback_data.id
+    
+    async with ReadSessionLocal() as session:
+        # Get scenario (primary key lookup)
+        scenario = await session.get(Situation, scenario_id)
         
         if not scenario:
             await callback.answer("Сценарій не знайдено!", show_alert=True)
             return
         
         # Save scenario to state
-        await state.update_data(
+        data = await state.update_data(
             scenario_id=scenario.id,
             scenario_title=scenario.title,
             scenario_description=scenario.description,
@@ -91,6 +146,9 @@ async def select_scenario(callback: CallbackQuery, state: FSMContext):
             scenario_vocabulary=scenario.vocabulary_focus or []
         )
     
+    # Quiz is generated in the background while intro and audio are sent
+    prefetch_quiz(callback.from_user.id, data)
+    
     await state.set_state(SurvivalMode.scenario_intro)
     
     # Show loading message
@@ -105,25 +163,54 @@ async def select_scenario(callback: CallbackQuery, state: FSMContext):
         "Готуйся до тесту! 🎯"
     )
     
-    # Try to generate audio
-    audio_path = None
-    if tts_service.client:
-        audio_path = await tts_service.generate_speech(scenario.description)
-    
-    if audio_path:
-        audio = FSInputFile(audio_path)
-        await callback.message.answer_audio(
-            audio,
-            caption=intro_text,
-            parse_mode='HTML'
-        )
-    else:
-        await callback.message.answer(intro_text, parse_mode='HTML')
-    
+    await callback.message.answer(intro_text, parse_mode='HTML')
     await callback.message.answer(
         "Готовий почати?",
         reply_markup=get_continue_keyboard("preview_vocabulary")
     )
+    
+    # Audio follows as a separate message when ready (TTS doesn't delay the intro)
+    task = asyncio.create_task(send_intro_audio(callback.message, scenario))
+    _audio_tasks.add(task)
+    task.add_done_callback(_audio_tasks.discard)
+
+
+async def send_intro_audio(message: Message, scenario: Situation):
+    """Send scenario intro audio in the background (errors are only logged)."""
+    try:
+        await _send_intro_audio(message, scenario)
+    except Exception as e:
+        print(f"❌ Failed to send intro audio: {e}")
+
+
+async def _send_intro_audio(message: Message, scenario: Situation):
+    """Send intro audio, reusing the already uploaded file when possible."""
+    # Already uploaded once: Telegram resends by file_id without upload or TTS
+    if scenario.audio_file_id:
+        try:
+            await message.answer_audio(scenario.audio_file_id, caption=AUDIO_CAPTION)
+            return
+        except TelegramBadRequest as e:
+            print(f"⚠️ Stored audio file_id rejected, uploading again: {e}")
+    
+    if not tts_service.client:
+        return
+    
+    audio_path = await tts_service.generate_speech(scenario.description)
+    if not audio_path:
+        return
+    
+    sent = await message.answer_audio(FSInputFile(audio_path), caption=AUDIO_CAPTION)
+    
+    if sent.audio:
+        async with SessionLocal() as session:
+            query = (
+                update(Situation)
+                .where(Situation.id == scenario.id)
+                .values(audio_file_id=sent.audio.file_id)
+            )
+            await session.execute(query)
+            await session.commit()
 
 
 @router.callback_query(F.data == "preview_vocabulary", SurvivalMode.scenario_intro)
@@ -134,21 +221,14 @@ async def preview_vocabulary(callback: CallbackQuery, state: FSMContext):
     
     if not vocab_list:
         # If no vocabulary, skip to quiz
-        await start_quiz(callback, state)
+        answer_early(callback)
+        await send_quiz(callback, state)
         return
     
     await state.set_state(SurvivalMode.preview_vocabulary)
     
-    # Format vocabulary list
-    vocab_text = "📚 <b>Словник для цього сценарію:</b>\n\n"
-    for word in vocab_list:
-        # Check if word has translation format "Word (Translation)" or just "Word"
-        if "(" in word and ")" in word:
-            vocab_text += f"🔹 {word}\n"
-        else:
-            vocab_text += f"🔹 {word}\n"
-            
-    vocab_text += "\nЗапам'ятай ці слова, вони зараз знадобляться!"
+    # Format vocabulary list ("Word (Translation)" or just "Word")
+    vocab_text = VOCAB_PREVIEW_TEMPLATE.format(words="\n".join(f"🔹 {word}" for word in vocab_list))
     
     await callback.message.edit_text(
         vocab_text,
@@ -162,69 +242,72 @@ async def preview_vocabulary(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(F.data == "start_quiz", SurvivalMode.scenario_intro)  # Fallback
 async def start_quiz(callback: CallbackQuery, state: FSMContext):
     """Generate and show quiz question."""
+    answer_early(callback)
+    await send_quiz(callback, state)
+
+
+async def send_quiz(callback: CallbackQuery, state: FSMContext):
+    """Add scenario words to SRS and show quiz question (callback is acknowledged by the caller)."""
     data = await state.get_data()
     vocab_list = data.get('scenario_vocabulary', [])
     
-    session_maker = models.get_session_maker()
-    async with session_maker() as session:
-        # Get user
-        query = select(User).where(User.telegram_id == callback.from_user.id)
-        result = await session.execute(query)
-        user = result.scalar_one_or_none()
+    async with SessionLocal() as session:
+        user = await get_user(session, callback.from_user.id)
         
         # Add vocabulary to SRS if it exists
         # We need to find or create these words in Vocabulary table first
-        from models.models import Vocabulary
+        from models.models import Vocabulary, dialect_insert
         from services.srs_service import srs_service
         
         if vocab_list:
+            rows = {}
             for item in vocab_list:
-                # Extract Polish word if format is "Polish (Ukrainian)"
-                polish_word = item.split("(")[0].strip() if "(" in item else item.strip()
-                
-                # Check if word exists in DB
-                v_query = select(Vocabulary).where(Vocabulary.word_polish == polish_word)
-                v_result = await session.execute(v_query)
-                vocab_item = v_result.scalar_one_or_none()
-                
-                if not vocab_item:
-                    # Create new vocabulary item
-                    # Try to extract translation if present
-                    translation = ""
-                    if "(" in item and ")" in item:
-                        translation = item.split("(")[1].replace(")", "").strip()
-                    
-                    vocab_item = Vocabulary(
-                        word_polish=polish_word,
-                        translation_ua=translation,
-                        translation_ru=translation,  # Fill required field
-                        difficulty_level=data['scenario_level'],
-                        category='scenario'
-                    )
-                    session.add(vocab_item)
-                    await session.flush()  # Get ID
+                # Extract Polish word and translation (if present) in one match
+                match = VOCAB_ITEM_RE.match(item)
+                polish_word, translation = match.group(1), match.group(2) or ""
                 
-                # Add to SRS service for user
-                await srs_service.add_word_to_user(session, user.id, vocab_item.id)
+                rows.setdefault(polish_word, {
+                    "word_polish": polish_word,
+                    "translation_ua": translation,
+                    "translation_ru": translation,  # Fill required field
+                    "difficulty_level": data['scenario_level'],
+                    "category": 'scenario'
+                })
+            
+            # Create missing words in one statement; existing ones are left untouched
+            stmt = dialect_insert(Vocabulary).on_conflict_do_nothing(
+                index_elements=[Vocabulary.word_polish]
+            ).returning(Vocabulary.id)
+            insert_result = await session.execute(stmt, list(rows.values()))
+            inserted_ids = insert_result.scalars().all()
+            
+            v_query = select(Vocabulary.id).where(Vocabulary.word_polish.in_(rows))
+            v_result = await session.execute(v_query)
+            
+            # Add to SRS service for user
+            await srs_service.add_words_to_user(session, user.id, v_result.scalars().all())
             
             await session.commit()
+            
+            # New words show up in everyone's vocabulary browser
+            if inserted_ids:
+                invalidate_vocab_pages()
         
         # Determine difficulty
         difficulty = "normal"
         # Could add logic here to check user's performance and adjust difficulty
     
-    await callback.message.edit_text("🤔 Генерую питання для тебе...")
-    await callback.answer()
-    
-    # Generate quiz
-    quiz = await ai_service.generate_quiz(
-        situation=data['scenario_title'],
-        situation_description=data['scenario_context'],
-        user_level=data['scenario_level'],
-        difficulty=difficulty,
-        target_vocabulary=vocab_list
+    # Placeholder is sent while the quiz is generated (edit errors are ignored)
+    placeholder = asyncio.gather(
+        callback.message.edit_text("🤔 Генерую питання для тебе..."),
+        return_exceptions=True
     )
     
+    # Generate quiz (usually already started during the intro)
+    quiz = await get_quiz(callback.from_user.id, data, difficulty)
+    
+    await placeholder
+    
     if not quiz:
         await callback.message.answer(
             "❌ Вибач, не вдалося згенерувати питання. Спробуй ще раз.",
@@ -234,14 +317,7 @@ async def start_quiz(callback: CallbackQuery, state: FSMContext):
         return
     
     # Shuffle answers
-    answers = [
-        quiz.correct_answer,
-        quiz.distractor_1,
-        quiz.distractor_2,
-        quiz.distractor_3
-    ]
-    random.shuffle(answers)
-    correct_index = answers.index(quiz.correct_answer)
+    answers, correct_index = shuffle_answers(quiz)
     
     # Save quiz data to state
     await state.update_data(
@@ -281,27 +357,25 @@ async def cancel_quiz(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("quiz_"), SurvivalMode.quiz_active)
+@router.callback_query(F.data.in_(ANSWER_INDEX), SurvivalMode.quiz_active)
 async def answer_quiz(callback: CallbackQuery, state: FSMContext):
     """Handle quiz answer."""
-    answer_index = int(callback.data.split("_")[1])
+    answer_early(callback)
+    
+    answer_index = ANSWER_INDEX[callback.data]
     data = await state.get_data()
     
     is_correct = (answer_index == data['quiz_correct_index'])
     
-    # Save to history
-    session_maker = models.get_session_maker()
-    async with session_maker() as session:
-        history = UserQuizHistory(
-            user_id=data['user_id'],
-            situation_id=data['scenario_id'],
-            question=data['quiz_question'],
-            user_answer=data['quiz_answers'][answer_index],
-            correct_answer=data['quiz_answers'][data['quiz_correct_index']],
-            is_correct=is_correct
-        )
-        session.add(history)
-        await session.commit()
+    # Save to history (written in the background, feedback doesn't wait for it)
+    history_writer.add(
+        user_id=data['user_id'],
+        situation_id=data['scenario_id'],
+        question=data['quiz_question'],
+        user_answer=data['quiz_answers'][answer_index],
+        correct_answer=data['quiz_answers'][data['quiz_correct_index']],
+        is_correct=is_correct
+    )
     
     await state.set_state(SurvivalMode.show_feedback)
     
@@ -323,7 +397,6 @@ async def answer_quiz(callback: CallbackQuery, state: FSMContext):
         reply_markup=get_continue_keyboard("continue_survival"),
         parse_mode='HTML'
     )
-    await callback.answer()
 
 
 @router.callback_query(F.data == "continue_survival", SurvivalMode.show_feedback)
@@ -1,14 +1,17 @@
 """Handlers for vocabulary browser and word management."""
 
 from aiogram import Router, F
-from aiogram.types import CallbackQuery
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
-from sqlalchemy import select
+from sqlalchemy import select, insert, delete, exists, literal, func, and_, or_, not_
+from sqlalchemy.ext.asyncio import AsyncSession
 from math import ceil
 
-from models import models
-from models.models import User, Vocabulary, WordLearningStats
+from models.models import SessionLocal, ReadSessionLocal, Vocabulary, WordLearningStats
 from utils.states import MainMenu
+from utils.callbacks import answer_early, VocabFilterCB, VocabPageCB, VocabAddCB, VocabRemoveCB
+from utils.user_cache import get_user
+from utils.vocab_page_cache import get_vocab_page, cache_vocab_page, invalidate_vocab_pages
 from utils.keyboards import (
     get_vocabulary_browser_keyboard,
     get_word_detail_keyboard,
@@ -19,115 +22,156 @@ router = Router()
 
 WORDS_PER_PAGE = 10
 
+# Filter type -> SQL condition on the user's (outer joined) learning stats
+_KNOWN = and_(WordLearningStats.know_count >= 3, WordLearningStats.dont_know_count == 0)
+VOCAB_FILTERS = {
+    "known": _KNOWN,
+    "learning": and_(
+        or_(WordLearningStats.know_count > 0, WordLearningStats.dont_know_count > 0),
+        not_(_KNOWN)
+    ),
+    "new": WordLearningStats.id.is_(None)
+}
+
+FILTER_NAMES = {
+    "all": "Всі слова",
+    "known": "Знаю",
+    "learning": "Вивчаю",
+    "new": "Нові"
+}
+
+
+def word_status(row) -> str:
+    """Status emoji of a page row (no stats_id: word has no stats row yet)."""
+    if row.stats_id is None:
+        return "🆕"
+    if row.know_count >= 3 and row.dont_know_count == 0:
+        return "✅"
+    return "📖"
+
+
+BACK_TO_BROWSER_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="🔙", callback_data="vocabulary_browser")]
+])
+
 
 @router.callback_query(F.data == "vocabulary_browser")
 async def show_vocabulary_browser(callback: CallbackQuery, state: FSMContext):
     """Show vocabulary browser with all words."""
+    answer_early(callback)
+    await reset_vocabulary_browser(callback, state)
+
+
+async def reset_vocabulary_browser(callback: CallbackQuery, state: FSMContext):
+    """Show first page of all words (callback is acknowledged by the caller)."""
     await state.update_data(vocab_page=0, vocab_filter="all")
     await display_vocabulary_page(callback, state, page=0, filter_type="all")
 
 
-@router.callback_query(F.data.startswith("vocab_filter_"))
-async def filter_vocabulary(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(VocabFilterCB.filter())
+async def filter_vocabulary(callback: CallbackQuery, callback_data: VocabFilterCB, state: FSMContext):
     """Filter vocabulary by type."""
-    filter_type = callback.data.replace("vocab_filter_", "")
+    answer_early(callback)
+    
+    filter_type = callback_data.kind
     await state.update_data(vocab_filter=filter_type, vocab_page=0)
     await display_vocabulary_page(callback, state, page=0, filter_type=filter_type)
 
 
-@router.callback_query(F.data.startswith("vocab_page_"))
-async def change_vocabulary_page(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(VocabPageCB.filter())
+async def change_vocabulary_page(callback: CallbackQuery, callback_data: VocabPageCB, state: FSMContext):
     """Change vocabulary page."""
-    page = int(callback.data.replace("vocab_page_", ""))
+    answer_early(callback)
+    
+    page = callback_data.page
     data = await state.get_data()
     filter_type = data.get("vocab_filter", "all")
     await display_vocabulary_page(callback, state, page=page, filter_type=filter_type)
 
 
 async def display_vocabulary_page(callback: CallbackQuery, state: FSMContext, page: int = 0, filter_type: str = "all"):
-    """Display vocabulary page with words."""
-    session_maker = models.get_session_maker()
-    async with session_maker() as session:
-        # Get user
-        query = select(User).where(User.telegram_id == callback.from_user.id)
-        result = await session.execute(query)
-        user = result.scalar_one_or_none()
-        
-        # Get all vocabulary
-        vocab_query = select(Vocabulary).where(Vocabulary.difficulty_level.in_(['A1', 'A2']))
-        vocab_result = await session.execute(vocab_query)
-        all_words = vocab_result.scalars().all()
+    """Display vocabulary page with words (callback is acknowledged by the caller)."""
+    async with ReadSessionLocal() as session:
+        user = await get_user(session, callback.from_user.id)
         
-        # Get user's learning stats
-        stats_query = select(WordLearningStats).where(WordLearningStats.user_id == user.id)
-        stats_result = await session.execute(stats_query)
-        stats_map = {s.word_id: s for s in stats_result.scalars().all()}
-        
-        # Filter words based on filter_type
-        filtered_words = []
-        for word in all_words:
-            stats = stats_map.get(word.id)
-            
-            if filter_type == "all":
-                filtered_words.append((word, stats))
-            elif filter_type == "known":
-                if stats and stats.know_count >= 3 and stats.dont_know_count == 0:
-                    filtered_words.append((word, stats))
-            elif filter_type == "learning":
-                if stats and (stats.know_count > 0 or stats.dont_know_count > 0):
-                    if not (stats.know_count >= 3 and stats.dont_know_count == 0):
-                        filtered_words.append((word, stats))
-            elif filter_type == "new":
-                if not stats:
-                    filtered_words.append((word, None))
-        
-        # Pagination
-        total_words = len(filtered_words)
-        total_pages = ceil(total_words / WORDS_PER_PAGE) if total_words > 0 else 1
-        start_idx = page * WORDS_PER_PAGE
-        end_idx = start_idx + WORDS_PER_PAGE
-        page_words = filtered_words[start_idx:end_idx]
-        
-        # Build text
-        filter_names = {
-            "all": "Всі слова",
-            "known": "Знаю",
-            "learning": "Вивчаю",
-            "new": "Нові"
-        }
-        
-        text = f"📖 <b>{filter_names.get(filter_type, 'Словник')}</b>\n\n"
-        text += f"Всього: <b>{total_words}</b> слів\n\n"
-        
-        if not page_words:
-            text += "😔 Немає слів у цій категорії.\n\n"
-            if filter_type == "new":
-                text += "Всі доступні слова вже додані до вивчення!"
-        else:
-            for word, stats in page_words:
-                # Status emoji
-                if not stats:
-                    status = "🆕"
-                elif stats.know_count >= 3 and stats.dont_know_count == 0:
-                    status = "✅"
-                else:
-                    status = "📖"
-                
-                text += f"{status} <b>{word.word_polish}</b> - {word.translation_ua}\n"
-                
-                if stats:
-                    text += f"   📊 Знаю: {stats.know_count} | Не знаю: {stats.dont_know_count}\n"
-                
-                text += "\n"
-            
-            text += f"\n<i>Натисни на фільтр щоб переключитися</i>"
+        # Same page with unchanged stats renders the same text: skip the queries
+        cached = get_vocab_page(user.id, filter_type, page)
+        if cached is None:
+            cached = await render_vocabulary_page(session, user.id, page, filter_type)
+            cache_vocab_page(user.id, filter_type, page, *cached)
+        text, total_pages = cached
     
     await state.update_data(vocab_page=page)
     
     keyboard = get_vocabulary_browser_keyboard(page=page, total_pages=total_pages, filter_type=filter_type)
     
     await callback.message.edit_text(text, reply_markup=keyboard, parse_mode='HTML')
-    await callback.answer()
+
+
+async def render_vocabulary_page(session: AsyncSession, user_id: int, page: int, filter_type: str) -> tuple[str, int]:
+    """Build vocabulary page text; returns (text, total_pages)."""
+    # Filter, count and paginate in the database (only one page is loaded)
+    conditions = [Vocabulary.difficulty_level.in_(['A1', 'A2'])]
+    if filter_type in VOCAB_FILTERS:
+        conditions.append(VOCAB_FILTERS[filter_type])
+    
+    stats_join = and_(
+        WordLearningStats.word_id == Vocabulary.id,
+        WordLearningStats.user_id == user_id
+    )
+    
+    count_query = (
+        select(func.count(Vocabulary.id))
+        .outerjoin(WordLearningStats, stats_join)
+        .where(*conditions)
+    )
+    total_words = await session.scalar(count_query)
+    total_pages = ceil(total_words / WORDS_PER_PAGE) if total_words > 0 else 1
+    
+    # Only the columns the page shows, no ORM objects
+    page_query = (
+        select(
+            Vocabulary.word_polish,
+            Vocabulary.translation_ua,
+            WordLearningStats.id.label('stats_id'),
+            WordLearningStats.know_count,
+            WordLearningStats.dont_know_count
+        )
+        .outerjoin(WordLearningStats, stats_join)
+        .where(*conditions)
+        .order_by(Vocabulary.id)
+        .limit(WORDS_PER_PAGE)
+        .offset(page * WORDS_PER_PAGE)
+    )
+    # Empty filter or page past the end: nothing to fetch
+    page_words = []
+    if page * WORDS_PER_PAGE < total_words:
+        page_result = await session.execute(page_query)
+        page_words = page_result.all()
+    
+    # Build text
+    lines = [
+        f"📖 <b>{FILTER_NAMES.get(filter_type, 'Словник')}</b>\n",
+        f"Всього: <b>{total_words}</b> слів\n"
+    ]
+    
+    if not page_words:
+        lines.append("😔 Немає слів у цій категорії.\n")
+        if filter_type == "new":
+            lines.append("Всі доступні слова вже додані до вивчення!")
+    else:
+        for row in page_words:
+            lines.append(f"{word_status(row)} <b>{row.word_polish}</b> - {row.translation_ua}")
+            
+            if row.stats_id is not None:
+                lines.append(f"   📊 Знаю: {row.know_count} | Не знаю: {row.dont_know_count}")
+            
+            lines.append("")
+        
+        lines.append("\n<i>Натисни на фільтр щоб переключитися</i>")
+    
+    text = "\n".join(lines)
+    return text, total_pages
 
 
 @router.callback_query(F.data == "vocab_noop")
@@ -145,78 +189,61 @@ async def add_custom_word(callback: CallbackQuery, state: FSMContext):
         "Поки що ти можеш вивчати 40 стартових слів. 📚"
     )
     
-    from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="🔙", callback_data="vocabulary_browser")]
-    ])
-    
-    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode='HTML')
+    await callback.message.edit_text(text, reply_markup=BACK_TO_BROWSER_KB, parse_mode='HTML')
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("vocab_remove_"))
-async def remove_word_from_learning(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(VocabRemoveCB.filter())
+async def remove_word_from_learning(callback: CallbackQuery, callback_data: VocabRemoveCB, state: FSMContext):
     """Remove word from user's learning list."""
-    word_id = int(callback.data.replace("vocab_remove_", ""))
-    
-    session_maker = models.get_session_maker()
-    async with session_maker() as session:
-        # Get user
-        query = select(User).where(User.telegram_id == callback.from_user.id)
-        result = await session.execute(query)
-        user = result.scalar_one_or_none()
+    word_id = callback_data.word_id
+    
+    async with SessionLocal() as session:
+        user = await get_user(session, callback.from_user.id)
         
         # Delete stats
-        stats_query = select(WordLearningStats).where(
+        stats_query = delete(WordLearningStats).where(
             WordLearningStats.user_id == user.id,
             WordLearningStats.word_id == word_id
         )
         stats_result = await session.execute(stats_query)
-        stats = stats_result.scalar_one_or_none()
+        await session.commit()
         
-        if stats:
-            await session.delete(stats)
-            await session.commit()
+        if stats_result.rowcount:
+            invalidate_vocab_pages(user.id)
             await callback.answer("🗑️ Слово видалено зі списку!", show_alert=True)
         else:
             await callback.answer("❌ Слово не знайдено", show_alert=True)
     
     # Return to vocabulary browser
-    await show_vocabulary_browser(callback, state)
+    await reset_vocabulary_browser(callback, state)
 
 
-@router.callback_query(F.data.startswith("vocab_add_"))
-async def add_word_to_learning(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(VocabAddCB.filter())
+async def add_word_to_learning(callback: CallbackQuery, callback_data: VocabAddCB, state: FSMContext):
     """Add word to user's learning list."""
-    word_id = int(callback.data.replace("vocab_add_", ""))
-    
-    session_maker = models.get_session_maker()
-    async with session_maker() as session:
-        # Get user
-        query = select(User).where(User.telegram_id == callback.from_user.id)
-        result = await session.execute(query)
-        user = result.scalar_one_or_none()
+    word_id = callback_data.word_id
+    
+    async with SessionLocal() as session:
+        user = await get_user(session, callback.from_user.id)
         
-        # Check if already exists
-        stats_query = select(WordLearningStats).where(
+        # Insert only if missing, in one statement (rowcount tells which happened)
+        already_added = exists().where(
             WordLearningStats.user_id == user.id,
             WordLearningStats.word_id == word_id
         )
+        stats_query = insert(WordLearningStats).from_select(
+            ['user_id', 'word_id', 'priority_score'],
+            select(literal(user.id), literal(word_id), literal(100.0)).where(~already_added)
+        )
         stats_result = await session.execute(stats_query)
-        existing = stats_result.scalar_one_or_none()
+        await session.commit()
         
-        if not existing:
-            # Create new stats
-            stats = WordLearningStats(
-                user_id=user.id,
-                word_id=word_id,
-                priority_score=100.0
-            )
-            session.add(stats)
-            await session.commit()
+        if stats_result.rowcount:
+            invalidate_vocab_pages(user.id)
             await callback.answer("✅ Слово додано до вивчення!", show_alert=True)
         else:
             await callback.answer("ℹ️ Слово вже у твоєму списку", show_alert=True)
     
     # Return to vocabulary browser
-    await show_vocabulary_browser(callback, state)
+    await reset_vocabulary_browser(callback, state)
@@ -0,0 +1,3 @@
+"""Initialize package modules."""
+
+# This file makes the middlewares directory a Python package
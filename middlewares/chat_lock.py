@@ -0,0 +1,41 @@
+"""Middleware that keeps update handling ordered within each chat."""
+
+import asyncio
+from weakref import WeakValueDictionary
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+
+class ChatLockMiddleware(BaseMiddleware):
+    """
+    Serialize handlers per chat while different chats run concurrently.
+    
+    Polling already runs every update in its own task, so a slow handler
+    (AI generation, heavy stats queries) never blocks other users. This lock
+    prevents two quick taps in the same chat from racing on the same FSM data.
+    """
+    
+    def __init__(self):
+        # Locks disappear automatically once no handler references them
+        self._locks: WeakValueDictionary[int, asyncio.Lock] = WeakValueDictionary()
+    
+    def _get_lock(self, chat_id: int) -> asyncio.Lock:
+        lock = self._locks.get(chat_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[chat_id] = lock
+        return lock
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        chat = data.get('event_chat')
+        if chat is None:
+            return await handler(event, data)
+        
+        async with self._get_lock(chat.id):
+            return await handler(event, data)
@@ -0,0 +1,59 @@
+"""Outbound request middleware that keeps the bot under Telegram's send limit."""
+
+import asyncio
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import (
+    TelegramMethod,
+    Response,
+    SendMessage,
+    SendAudio,
+    SendVoice,
+    SendPhoto,
+    EditMessageText,
+    EditMessageReplyMarkup,
+    DeleteMessage,
+)
+
+# Methods counted against the ~30 msg/s bot-wide ceiling.
+# answerCallbackQuery and getUpdates are deliberately not throttled.
+LIMITED_METHODS = (
+    SendMessage,
+    SendAudio,
+    SendVoice,
+    SendPhoto,
+    EditMessageText,
+    EditMessageReplyMarkup,
+    DeleteMessage,
+)
+
+
+class OutboundRateLimitMiddleware(BaseRequestMiddleware):
+    """
+    Space outgoing messages evenly at a fixed rate.
+    
+    Requests get slots in arrival order, so under a burst every chat waits
+    its turn instead of the API answering with 429 and retry-after pauses.
+    """
+    
+    def __init__(self, rate: float = 30):
+        self._interval = 1 / rate
+        self._next_slot = 0.0
+    
+    async def _acquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self._interval
+        
+        if slot > now:
+            await asyncio.sleep(slot - now)
+    
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot,
+        method: TelegramMethod
+    ) -> Response:
+        if isinstance(method, LIMITED_METHODS):
+            await self._acquire()
+        return await make_request(bot, method)
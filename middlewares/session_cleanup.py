@@ -0,0 +1,52 @@
+"""Middleware that drops a mode's background work once the user leaves the mode."""
+
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import StatesGroup
+from aiogram.types import TelegramObject
+
+
+class SessionCleanupMiddleware(BaseMiddleware):
+    """
+    Cancel prefetched work of a mode when the FSM state leaves its states group.
+
+    Sessions can be left from anywhere (main menu, bottom menu, /start, other
+    modes), so the check runs after every handler instead of at each exit.
+    The state is only read for users that have pending work.
+    """
+
+    def __init__(self):
+        # (states group, has pending work(telegram_id), cancel(telegram_id))
+        self._modes: list[tuple[type[StatesGroup], Callable[[int], bool], Callable[[int], None]]] = []
+
+    def register(
+        self,
+        group: type[StatesGroup],
+        has_pending: Callable[[int], bool],
+        cancel: Callable[[int], None]
+    ) -> None:
+        """Cancel work of a mode once the user's state is outside group."""
+        self._modes.append((group, has_pending, cancel))
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        result = await handler(event, data)
+
+        user = data.get('event_from_user')
+        state: FSMContext = data.get('state')
+        if user is None or state is None:
+            return result
+
+        pending = [(group, cancel) for group, has_pending, cancel in self._modes if has_pending(user.id)]
+        if pending:
+            current = await state.get_state()
+            for group, cancel in pending:
+                if current not in group:
+                    cancel(user.id)
+
+        return result
@@ -1,5 +1,6 @@
+import math
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Text, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Text, JSON, Index, event, inspect, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base, relationship
 from sqlalchemy.sql import func
@@ -53,6 +54,9 @@ class Vocabulary(Base):
 class UserProgress(Base):
     """User progress for vocabulary using SRS algorithm."""
     __tablename__ = 'user_progress'
+    __table_args__ = (
+        Index('ix_up_user_review', 'user_id', 'next_review_time'),  # Due words lookup
+    )
     
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
@@ -91,6 +95,7 @@ class Situation(Base):
     context_prompt = Column(Text, nullable=False)  # Prompt sent to AI
     is_active = Column(Boolean, default=True)
     vocabulary_focus = Column(JSON, nullable=True)  # List of target words
+    audio_file_id = Column(String(255), nullable=True)  # Telegram file_id of uploaded intro audio
     
     # Relationships
     quiz_history = relationship('UserQuizHistory', back_populates='situation')
@@ -126,6 +131,9 @@ class UserQuizHistory(Base):
 class WordLearningStats(Base):
     """Track flashcard learning statistics for words."""
     __tablename__ = 'word_learning_stats'
+    __table_args__ = (
+        Index('ix_wls_user_word', 'user_id', 'word_id'),  # Per-user stats lookup and join
+    )
     
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
@@ -147,33 +155,128 @@ class WordLearningStats(Base):
         return f"<WordLearningStats(user_id={self.user_id}, word_id={self.word_id}, priority={self.priority_score})>"
 
 
+class Meta(Base):
+    """Key-value store for internal bookkeeping (e.g. seed data hashes)."""
+    __tablename__ = 'meta'
+    
+    key = Column(String(100), primary_key=True)
+    value = Column(Text, nullable=True)
+    
+    def __repr__(self):
+        return f"<Meta(key={self.key}, value={self.value})>"
+
+
+class AIQuestionCache(Base):
+    """Cached AI responses, several variants per key."""
+    __tablename__ = 'ai_question_cache'
+    __table_args__ = (
+        Index('ix_aiqc_key_created', 'cache_key', 'created_at'),  # Fresh variants of a key
+    )
+    
+    id = Column(Integer, primary_key=True)
+    cache_key = Column(String(64), nullable=False)
+    payload = Column(Text, nullable=False)  # JSON-serialized pydantic model
+    created_at = Column(DateTime, default=func.now())
+    
+    def __repr__(self):
+        return f"<AIQuestionCache(key={self.cache_key}, created_at={self.created_at})>"
+
+
 # Database engine and session management
 engine = None
+
+# Created unbound at import so handlers can import it directly; init_db binds it
+SessionLocal = async_sessionmaker(class_=AsyncSession, expire_on_commit=False)
+# For handlers that only read: autocommit connection, no BEGIN/ROLLBACK round-trips
+ReadSessionLocal = async_sessionmaker(class_=AsyncSession, expire_on_commit=False)
 async_session_maker = None
 
+# Columns added after the initial schema: (table, column, DDL type)
+MIGRATION_COLUMNS = [
+    ('situations', 'vocabulary_focus', 'JSON'),
+    ('vocabulary', 'example_sentence_pl', 'TEXT'),
+    ('vocabulary', 'emoji', 'VARCHAR(10)'),
+    ('situations', 'audio_file_id', 'VARCHAR(255)'),
+]
+
+
+def _add_missing_indexes(sync_conn):
+    """Create indexes missing from pre-existing tables (create_all skips them)."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
+def _add_missing_columns(sync_conn):
+    """Add columns missing from pre-existing tables (simple migration)."""
+    inspector = inspect(sync_conn)
+    for table, column, ddl_type in MIGRATION_COLUMNS:
+        existing = {c['name'] for c in inspector.get_columns(table)}
+        if column not in existing:
+            sync_conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+            print(f"✅ Added column {table}.{column}")
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Enable WAL so readers don't block on writers (runs for every new connection)."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+    
+    # power() is missing from SQLite builds without math functions (PostgreSQL has it)
+    dbapi_connection.create_function("power", 2, math.pow, deterministic=True)
+
 
 async def init_db():
     """Initialize database connection and create tables."""
     global engine, async_session_maker
     
+    if config.DATABASE_URL.startswith('sqlite'):
+        # Wait for a locked database instead of failing right away
+        engine_options = dict(connect_args={'timeout': 30})
+    else:
+        engine_options = dict(
+            pool_pre_ping=True,
+            pool_size=config.DB_POOL_SIZE,
+            max_overflow=config.DB_MAX_OVERFLOW,
+            # Server-side prepared statements reused per connection
+            connect_args={'prepared_statement_cache_size': config.DB_PREPARED_STATEMENT_CACHE_SIZE}
+        )
+    
     engine = create_async_engine(
         config.DATABASE_URL,
         echo=False,
-        future=True
+        future=True,
+        query_cache_size=config.DB_QUERY_CACHE_SIZE,
+        **engine_options
     )
     
-    async_session_maker = async_sessionmaker(
-        engine,
-        class_=AsyncSession,
-        expire_on_commit=False
-    )
+    if engine.dialect.name == 'sqlite':
+        event.listen(engine.sync_engine, 'connect', _set_sqlite_pragmas)
+    
+    SessionLocal.configure(bind=engine)
+    ReadSessionLocal.configure(bind=engine.execution_options(isolation_level="AUTOCOMMIT"))
+    async_session_maker = SessionLocal
     
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
+        await conn.run_sync(_add_missing_indexes)
     
     print("✅ Database initialized successfully")
 
 
+def dialect_insert(model):
+    """Get INSERT construct supporting ON CONFLICT for the active database."""
+    if engine is not None and engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+
 def get_session_maker():
     """Get the session maker (must be called after init_db)."""
     if async_session_maker is None:
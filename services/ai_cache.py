@@ -0,0 +1,147 @@
+"""Persistent cache for AI-generated content."""
+
+import asyncio
+import hashlib
+import random
+import inspect
+from datetime import datetime, timedelta
+from functools import wraps
+from typing import Type
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import select, delete
+
+from models import models
+from models.models import AIQuestionCache
+import config
+
+
+# Generations that outlived their timeout; referenced until they finish
+_background: set[asyncio.Task] = set()
+
+
+def _on_background_done(task: asyncio.Task) -> None:
+    _background.discard(task)
+    if not task.cancelled() and task.exception():
+        print(f"❌ Background AI generation failed: {task.exception()}")
+
+
+def normalize_key_part(value) -> str:
+    """Normalize argument so trivially different spellings share a cache entry."""
+    # Case and whitespace only; Polish diacritics change meaning and are kept
+    return " ".join(str(value).split()).casefold()
+
+
+def make_cache_key(*parts) -> str:
+    """Build cache key from call arguments."""
+    raw = "|".join(normalize_key_part(p) for p in parts)
+    return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+
+def cached_ai(
+    model: Type[BaseModel],
+    key_args: tuple[str, ...],
+    ttl: int = config.AI_CACHE_TTL,
+    variants: int = config.AI_CACHE_VARIANTS,
+    timeout: float = config.AI_FALLBACK_TIMEOUT
+):
+    """
+    Cache results of an AI generation method in the database.
+    
+    Up to `variants` results are stored per key; once the pool is full a
+    random cached variant is returned without calling the LLM. While the
+    pool is filling, a slow LLM call falls back to any cached variant
+    (the newest expired one if none is fresh) after `timeout` seconds; the
+    call keeps running in the background and its result is still stored.
+    Expired variants of a key are deleted when a new one is stored.
+    
+    Args:
+        model: Pydantic model the method returns
+        key_args: Names of arguments that identify the request
+        ttl: Seconds before cached results expire
+        variants: Number of results kept per key
+        timeout: Seconds to wait for the LLM when a fallback is available
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            try:
+                session_maker = models.get_session_maker()
+            except RuntimeError:
+                return await func(*args, **kwargs)
+            
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = make_cache_key(func.__name__, *(bound.arguments[name] for name in key_args))
+            
+            expires_before = datetime.utcnow() - timedelta(seconds=ttl)
+            
+            async with session_maker() as session:
+                query = (
+                    select(AIQuestionCache.payload)
+                    .where(AIQuestionCache.cache_key == key)
+                    .where(AIQuestionCache.created_at >= expires_before)
+                    .limit(variants)
+                )
+                result = await session.execute(query)
+                payloads = result.scalars().all()
+            
+            if len(payloads) >= variants:
+                try:
+                    return model.model_validate_json(random.choice(payloads))
+                except ValidationError as e:
+                    print(f"⚠️ Invalid cached AI payload, regenerating: {e}")
+            
+            async def generate_and_store():
+                value = await func(*args, **kwargs)
+                
+                if value is not None:
+                    async with session_maker() as session:
+                        await session.execute(
+                            delete(AIQuestionCache)
+                            .where(AIQuestionCache.cache_key == key)
+                            .where(AIQuestionCache.created_at < expires_before)
+                        )
+                        session.add(AIQuestionCache(
+                            cache_key=key,
+                            payload=value.model_dump_json(),
+                            created_at=datetime.utcnow()
+                        ))
+                        await session.commit()
+                
+                return value
+            
+            fallback = payloads
+            if not fallback:
+                # Expired variants are still better than waiting on a slow LLM
+                async with session_maker() as session:
+                    query = (
+                        select(AIQuestionCache.payload)
+                        .where(AIQuestionCache.cache_key == key)
+                        .order_by(AIQuestionCache.created_at.desc())
+                        .limit(1)
+                    )
+                    fallback = (await session.execute(query)).scalars().all()
+            
+            # Nothing to fall back to: wait for the LLM as long as it takes
+            if not fallback:
+                return await generate_and_store()
+            
+            task = asyncio.create_task(generate_and_store())
+            try:
+                # Shield so a timeout doesn't cancel generation (result is still cached)
+                return await asyncio.wait_for(asyncio.shield(task), timeout)
+            except asyncio.TimeoutError:
+                _background.add(task)
+                task.add_done_callback(_on_background_done)
+            
+            print(f"⏱️ {func.__name__} is slow, serving cached variant")
+            try:
+                return model.model_validate_json(random.choice(fallback))
+            except ValidationError as e:
+                print(f"⚠️ Invalid cached AI payload: {e}")
+                return await task
+        
+        return wrapper
+    return decorator
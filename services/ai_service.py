@@ -1,10 +1,12 @@
 """AI service for generating quiz questions and content using Groq API."""
 
-import json
+import random
 import asyncio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from typing import Optional, Dict, Any
 from pydantic import BaseModel, Field, ValidationError
-from groq import AsyncGroq
+from groq import AsyncGroq, RateLimitError
 import config
 from utils.prompts import (
     QUIZ_SYSTEM_PROMPT,
@@ -12,8 +14,11 @@ from utils.prompts import (
     QUIZ_DIFFICULTY_NORMAL,
     FILL_IN_BLANK_PROMPT,
     FILL_IN_BLANK_WITH_EXPLANATION_PROMPT,
+    FILL_IN_BLANK_USER_PROMPT,
     SCENARIO_INTRO_PROMPT
 )
+from services.ai_cache import cached_ai
+from services.http_client import http_client
 
 
 class QuizData(BaseModel):
@@ -44,11 +49,102 @@ class ScenarioIntroData(BaseModel):
     intro_ru: str = Field(..., min_length=20, max_length=500)
 
 
+def shuffle_answers(question) -> tuple[list[str], int]:
+    """
+    Get answer options in random order.
+    
+    Args:
+        question: QuizData or FillInBlankData
+    
+    Returns:
+        Tuple of (answers, index of the correct answer)
+    """
+    answers = [question.distractor_1, question.distractor_2, question.distractor_3]
+    random.shuffle(answers)
+    
+    # Correct answer goes to a random slot, so no lookup is needed afterwards
+    correct_index = random.randrange(len(answers) + 1)
+    answers.insert(correct_index, question.correct_answer)
+    return answers, correct_index
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with jitter, so concurrent retries don't fire together."""
+    return min(config.GROQ_RETRY_MAX_DELAY, 2 ** attempt) + random.uniform(0, 1)
+
+
+def retry_after(error: RateLimitError) -> Optional[float]:
+    """Seconds the API asked us to wait (Retry-After header), if given."""
+    try:
+        return float(error.response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+# Limits concurrent LLM calls made ahead of time (prefetch); calls a user is
+# waiting on never queue for these slots
+_background_slots = asyncio.Semaphore(config.GROQ_MAX_PARALLEL)
+
+# Inside a BackgroundGeneration: event set once a user waits for the result
+_promoted: ContextVar[Optional[asyncio.Event]] = ContextVar('ai_promoted', default=None)
+
+
+class BackgroundGeneration:
+    """AI generation started ahead of time; its LLM calls wait for a background slot until promoted."""
+    
+    def __init__(self, coro):
+        self.promoted = asyncio.Event()
+        self.task = asyncio.create_task(self._run(coro))
+    
+    async def _run(self, coro):
+        # Tasks created inside (cache writes) inherit the flag
+        _promoted.set(self.promoted)
+        return await coro
+    
+    async def result(self):
+        """Wait for the result with foreground priority."""
+        self.promoted.set()
+        return await self.task
+    
+    def cancel(self):
+        """Stop generation if it is still running."""
+        if not self.task.done():
+            self.task.cancel()
+
+
+@asynccontextmanager
+async def llm_slot():
+    """Hold a background LLM slot for the duration of a request (no-op in the foreground)."""
+    promoted = _promoted.get()
+    if promoted is None or promoted.is_set():
+        yield
+        return
+    
+    acquire = asyncio.ensure_future(_background_slots.acquire())
+    wait_promoted = asyncio.ensure_future(promoted.wait())
+    try:
+        await asyncio.wait({acquire, wait_promoted}, return_when=asyncio.FIRST_COMPLETED)
+    except BaseException:
+        if acquire.done() and not acquire.cancelled():
+            _background_slots.release()
+        raise
+    finally:
+        wait_promoted.cancel()
+        acquire.cancel()  # Cancelled acquire hands a granted slot back itself
+    
+    held = acquire.done() and not acquire.cancelled()
+    try:
+        yield
+    finally:
+        if held:
+            _background_slots.release()
+
+
 class AIService:
     """Service for AI-powered content generation."""
     
     def __init__(self):
-        self.client = AsyncGroq(api_key=config.GROQ_API_KEY)
+        self.client = AsyncGroq(api_key=config.GROQ_API_KEY, http_client=http_client)
         self.model = config.GROQ_MODEL
         self.temperature = config.GROQ_TEMPERATURE
         self.max_tokens = config.GROQ_MAX_TOKENS
@@ -64,17 +160,18 @@ class AIService:
             try:
                 print(f"🤖 AI API запит (спроба {attempt + 1}/{max_retries})...")
                 
-                response = await self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    temperature=self.temperature,
-                    max_tokens=self.max_tokens,
-                    response_format={"type": "json_object"},
-                    timeout=60.0  # Increased timeout
-                )
+                async with llm_slot():
+                    response = await self.client.chat.completions.create(
+                        model=self.model,
+                        messages=[
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user", "content": user_prompt}
+                        ],
+                        temperature=self.temperature,
+                        max_tokens=self.max_tokens,
+                        response_format={"type": "json_object"},
+                        timeout=60.0  # Increased timeout
+                    )
                 
                 content = response.choices[0].message.content
                 print(f"✅ AI відповідь отримана (довжина: {len(content)} символів)")
@@ -83,8 +180,8 @@ class AIService:
             except asyncio.TimeoutError as e:
                 print(f"⏱️ Timeout помилка (спроба {attempt + 1}/{max_retries}): {e}")
                 if attempt < max_retries - 1:
-                    wait_time = 2 ** attempt
-                    print(f"⏳ Очікування {wait_time}с перед повторною спробою...")
+                    wait_time = backoff_delay(attempt)
+                    print(f"⏳ Очікування {wait_time:.1f}с перед повторною спробою...")
                     await asyncio.sleep(wait_time)
                 else:
                     print("❌ Всі спроби вичерпано через timeout")
@@ -96,18 +193,26 @@ class AIService:
                 print(f"   Деталі: {error_msg}")
                 
                 # Check if it's a rate limit error
-                if "rate_limit" in error_msg.lower() or "429" in error_msg:
+                if isinstance(e, RateLimitError) or "rate_limit" in error_msg.lower() or "429" in error_msg:
                     print("🚫 Rate limit досягнуто, очікування довше...")
                     if attempt < max_retries - 1:
-                        await asyncio.sleep(10)
+                        # Wait as long as the server asks; fixed delay plus jitter otherwise
+                        wait_time = retry_after(e) if isinstance(e, RateLimitError) else None
+                        if wait_time is None:
+                            wait_time = config.GROQ_RATE_LIMIT_DELAY + random.uniform(0, 1)
+                        await asyncio.sleep(wait_time)
                 elif attempt < max_retries - 1:
-                    await asyncio.sleep(2 ** attempt)
+                    await asyncio.sleep(backoff_delay(attempt))
                 else:
                     print(f"❌ Всі спроби вичерпано. Остання помилка: {error_msg}")
                     return None
         
         return None
     
+    @cached_ai(
+        QuizData,
+        key_args=("situation", "situation_description", "user_level", "difficulty", "target_vocabulary")
+    )
     async def generate_quiz(
         self,
         situation: str,
@@ -153,14 +258,15 @@ class AIService:
             return None
         
         try:
-            data = json.loads(response)
-            quiz = QuizData(**data)
+            # Parsed and validated in one pass (invalid JSON is a ValidationError too)
+            quiz = QuizData.model_validate_json(response)
             return quiz
-        except (json.JSONDecodeError, ValidationError) as e:
+        except ValidationError as e:
             print(f"❌ Failed to parse quiz data: {e}")
             print(f"Raw response: {response}")
             return None
     
+    @cached_ai(FillInBlankData, key_args=("word", "user_level"))
     async def generate_fill_in_blank(
         self,
         word: str,
@@ -180,15 +286,15 @@ class AIService:
         Returns:
             FillInBlankData object or None if generation failed
         """
-        system_prompt = FILL_IN_BLANK_WITH_EXPLANATION_PROMPT.format(
+        # System prompt is identical for every word (cacheable prefix)
+        system_prompt = FILL_IN_BLANK_WITH_EXPLANATION_PROMPT
+        
+        user_prompt = FILL_IN_BLANK_USER_PROMPT.format(
             word=word,
             translation_ua=translation_ua,
-            translation_ru=translation_ru,
             level=user_level
         )
         
-        user_prompt = f"Create a fill-in-the-blank question for the word: {word}"
-        
         response = await self._make_request(system_prompt, user_prompt)
         
         if not response:
@@ -196,10 +302,9 @@ class AIService:
             return None
         
         try:
-            data = json.loads(response)
-            question = FillInBlankData(**data)
+            question = FillInBlankData.model_validate_json(response)
             return question
-        except (json.JSONDecodeError, ValidationError) as e:
+        except ValidationError as e:
             print(f"❌ Failed to parse fill-in-blank data: {e}")
             return None
     
@@ -234,10 +339,9 @@ class AIService:
             return None
         
         try:
-            data = json.loads(response)
-            intro = ScenarioIntroData(**data)
+            intro = ScenarioIntroData.model_validate_json(response)
             return intro
-        except (json.JSONDecodeError, ValidationError) as e:
+        except ValidationError as e:
             print(f"❌ Failed to parse scenario intro: {e}")
             return None
 
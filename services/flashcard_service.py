@@ -2,9 +2,11 @@
 
 from datetime import datetime, timedelta
 from typing import Optional, Dict
-from sqlalchemy import select, or_
+from sqlalchemy import select, update, and_, exists, func, case, cast, Integer
+from sqlalchemy.orm import aliased
 from sqlalchemy.ext.asyncio import AsyncSession
 from models.models import Vocabulary, WordLearningStats
+from utils.vocab_page_cache import invalidate_vocab_pages
 
 
 class FlashcardService:
@@ -20,8 +22,8 @@ class FlashcardService:
         Get next word to show to user based on priority algorithm.
         
         Priority calculation:
-        - New words (never seen): priority = 100
-        - Known words: priority = (dont_know_count * 3) - (know_count * 1) + (days_since_last_shown * 2)
+        - New words (never seen): priority = 100 on the user's first card, base priority 10 after that
+        - Known words: priority = (dont_know_count * 3) - (know_count * 1) + (days_since_last_shown * 2) + 10
         
         Args:
             session: Database session
@@ -33,70 +35,67 @@ class FlashcardService:
         """
         exclude_word_ids = exclude_word_ids or []
         
-        # Get all vocabulary words
-        vocab_query = select(Vocabulary).where(Vocabulary.difficulty_level.in_(['A1', 'A2']))
+        # Whole days since last shown, computed by the database (0 if never shown)
+        now = datetime.utcnow()
+        if session.bind.dialect.name == 'postgresql':
+            days = func.floor(func.extract('epoch', now - WordLearningStats.last_shown) / 86400)
+        else:
+            days = cast(func.julianday(now) - func.julianday(WordLearningStats.last_shown), Integer)
+        days_since_shown = func.coalesce(days, 0)
+        
+        performance = (
+            (WordLearningStats.dont_know_count * 3.0)
+            - (WordLearningStats.know_count * 1.0)
+            + (days_since_shown * 2.0)
+            + 10.0  # Base priority
+        )
+        
+        # Words without a stats row rank like never-answered words (base priority),
+        # except on the very first card when the user has no stats at all
+        user_stats = aliased(WordLearningStats)
+        has_stats = exists().where(user_stats.user_id == user_id)
+        new_word_priority = case((has_stats, 10.0), else_=100.0)
+        
+        priority = case(
+            (WordLearningStats.id.is_(None), new_word_priority),
+            (performance < 0, 0.0),  # Never negative
+            else_=performance
+        )
+        
+        # Rank all words in the database and load only the top one
+        query = (
+            select(Vocabulary, WordLearningStats)
+            .outerjoin(WordLearningStats, and_(
+                WordLearningStats.word_id == Vocabulary.id,
+                WordLearningStats.user_id == user_id
+            ))
+            .where(Vocabulary.difficulty_level.in_(['A1', 'A2']))
+            .order_by(priority.desc(), Vocabulary.id)
+            .limit(1)
+        )
         if exclude_word_ids:
-            vocab_query = vocab_query.where(~Vocabulary.id.in_(exclude_word_ids))
+            query = query.where(~Vocabulary.id.in_(exclude_word_ids))
         
-        vocab_result = await session.execute(vocab_query)
-        all_words = vocab_result.scalars().all()
+        result = await session.execute(query)
+        row = result.first()
         
-        if not all_words:
+        if not row:
             return None
         
-        # Get user's learning stats for these words
-        word_ids = [w.id for w in all_words]
-        stats_query = select(WordLearningStats).where(
-            WordLearningStats.user_id == user_id,
-            WordLearningStats.word_id.in_(word_ids)
-        )
-        stats_result = await session.execute(stats_query)
-        stats_map = {stat.word_id: stat for stat in stats_result.scalars().all()}
-        
-        # Calculate priority for each word
-        word_priorities = []
-        
-        for word in all_words:
-            stats = stats_map.get(word.id)
-            
-            if not stats:
-                # New word - high priority
-                priority = 100.0
-                # Create stats entry
-                stats = WordLearningStats(
-                    user_id=user_id,
-                    word_id=word.id,
-                    priority_score=priority
-                )
-                session.add(stats)
-            else:
-                # Calculate priority based on performance
-                days_since_shown = 0
-                if stats.last_shown:
-                    days_since_shown = (datetime.utcnow() - stats.last_shown).days
-                
-                priority = (
-                    (stats.dont_know_count * 3.0)
-                    - (stats.know_count * 1.0)
-                    + (days_since_shown * 2.0)
-                    + 10.0  # Base priority
-                )
-                priority = max(0.0, priority)  # Never negative
-                
-                # Update priority in stats
-                stats.priority_score = priority
-            
-            word_priorities.append((word, stats, priority))
-        
-        # Sort by priority (highest first)
-        word_priorities.sort(key=lambda x: x[2], reverse=True)
-        
-        # Return highest priority word
-        if word_priorities:
+        word, stats = row
+        
+        if not stats:
+            # First time shown: create stats entry
+            stats = WordLearningStats(
+                user_id=user_id,
+                word_id=word.id,
+                priority_score=100.0
+            )
+            session.add(stats)
             await session.commit()
-            return word_priorities[0][0], word_priorities[0][1]
+            invalidate_vocab_pages(user_id)
         
-        return None
+        return word, stats
     
     @staticmethod
     async def update_word_stats(
@@ -112,35 +111,39 @@ class FlashcardService:
             stats_id: WordLearningStats ID
             knows_word: True if user pressed green button, False for red
         """
-        query = select(WordLearningStats).where(WordLearningStats.id == stats_id)
-        result = await session.execute(query)
-        stats = result.scalar_one_or_none()
-        
-        if not stats:
-            return
-        
-        # Update counts
-        if knows_word:
-            stats.know_count += 1
-        else:
-            stats.dont_know_count += 1
-        
-        # Update last shown time
-        stats.last_shown = datetime.utcnow()
+        # Counts after this answer (expressions over the current row values)
+        know_count = WordLearningStats.know_count + (1 if knows_word else 0)
+        dont_know_count = WordLearningStats.dont_know_count + (0 if knows_word else 1)
         
         # SMART LEARNING: Recalculate priority
         # Words with mistakes get MUCH higher priority (exponential)
-        mistake_bonus = (stats.dont_know_count ** 1.5) * 20
-        knowledge_penalty = (stats.know_count ** 0.8) * 8
+        mistake_bonus = func.power(dont_know_count, 1.5) * 20
+        knowledge_penalty = func.power(know_count, 0.8) * 8
         
         # If mastered (3+ correct, 0 wrong), very low priority
-        if stats.know_count >= 3 and stats.dont_know_count == 0:
-            knowledge_penalty += 50
+        mastered_penalty = case(((know_count >= 3) & (dont_know_count == 0), 50), else_=0)
+        
+        priority = 100.0 + mistake_bonus - knowledge_penalty - mastered_penalty
+        
+        # One UPDATE instead of loading the row first
+        query = (
+            update(WordLearningStats)
+            .where(WordLearningStats.id == stats_id)
+            .values(
+                know_count=know_count,
+                dont_know_count=dont_know_count,
+                last_shown=datetime.utcnow(),
+                priority_score=case((priority < 1.0, 1.0), else_=priority)
+            )
+            .returning(WordLearningStats.user_id)
+        )
+        user_id = await session.scalar(query)
         
-        priority = 100.0 + mistake_bonus - knowledge_penalty
-        stats.priority_score = max(1.0, priority)
+        if user_id is None:
+            return
         
         await session.commit()
+        invalidate_vocab_pages(user_id)
     
     @staticmethod
     async def get_learning_stats(
@@ -157,11 +160,27 @@ class FlashcardService:
         Returns:
             Dictionary with learning stats
         """
-        query = select(WordLearningStats).where(WordLearningStats.user_id == user_id)
+        # Count words by knowledge level in one aggregate query
+        is_known = (WordLearningStats.know_count >= 3) & (WordLearningStats.dont_know_count == 0)
+        is_seen = (WordLearningStats.know_count > 0) | (WordLearningStats.dont_know_count > 0)
+        
+        # Total vocabulary count as a scalar subquery of the same statement
+        total_available = (
+            select(func.count(Vocabulary.id))
+            .where(Vocabulary.difficulty_level.in_(['A1', 'A2']))
+            .scalar_subquery()
+        )
+        
+        query = select(
+            func.count(WordLearningStats.id),
+            func.count(case((is_known, 1))),
+            func.count(case((is_seen, 1))),
+            total_available
+        ).where(WordLearningStats.user_id == user_id)
         result = await session.execute(query)
-        all_stats = result.scalars().all()
+        total_words, known_words, seen_words, total_available = result.one()
         
-        if not all_stats:
+        if not total_words:
             return {
                 "total_words": 0,
                 "known_words": 0,
@@ -169,20 +188,11 @@ class FlashcardService:
                 "new_words": 0
             }
         
-        # Count words by knowledge level
-        known_words = sum(1 for s in all_stats if s.know_count >= 3 and s.dont_know_count == 0)
-        learning_words = sum(1 for s in all_stats if s.know_count > 0 or s.dont_know_count > 0)
-        learning_words -= known_words  # Exclude already known
-        
-        # Get total vocabulary count
-        vocab_query = select(Vocabulary).where(Vocabulary.difficulty_level.in_(['A1', 'A2']))
-        vocab_result = await session.execute(vocab_query)
-        total_available = len(vocab_result.scalars().all())
-        
-        new_words = total_available - len(all_stats)
+        learning_words = seen_words - known_words  # Exclude already known
+        new_words = total_available - total_words
         
         return {
-            "total_words": len(all_stats),
+            "total_words": total_words,
             "known_words": known_words,
             "learning_words": learning_words,
             "new_words": new_words
@@ -0,0 +1,89 @@
+"""Background writer that batches quiz history inserts."""
+
+import asyncio
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import insert
+from models.models import SessionLocal, UserQuizHistory
+import config
+
+
+class HistoryWriter:
+    """Queue quiz history rows and insert them in batches off the request path."""
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=config.HISTORY_QUEUE_MAX_SIZE)
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, **row) -> None:
+        """
+        Queue a history row for writing (does not wait for the database).
+
+        Args:
+            row: UserQuizHistory column values
+        """
+        row.setdefault('timestamp', datetime.utcnow())
+        try:
+            self.queue.put_nowait(row)
+        except asyncio.QueueFull:
+            print("⚠️ Quiz history queue is full, dropping row")
+
+    def start(self) -> None:
+        """Start the writer task (call once the event loop is running)."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Write queued rows and stop the writer task."""
+        if self._task is None:
+            return
+
+        # Sentinel lets the writer flush everything queued before it
+        await self.queue.put(None)
+        await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        """Collect rows until the batch is full or the flush interval passes."""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            row = await self.queue.get()
+            if row is None:
+                return
+
+            rows = [row]
+            deadline = loop.time() + config.HISTORY_FLUSH_INTERVAL
+            stopping = False
+
+            while len(rows) < config.HISTORY_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is None:
+                    stopping = True
+                    break
+                rows.append(row)
+
+            await self._write(rows)
+
+            if stopping:
+                return
+
+    @staticmethod
+    async def _write(rows: list[dict]) -> None:
+        """Insert rows with a single executemany statement."""
+        try:
+            async with SessionLocal() as session:
+                await session.execute(insert(UserQuizHistory), rows)
+                await session.commit()
+        except Exception as e:
+            print(f"❌ Failed to write {len(rows)} quiz history rows: {e}")
+
+
+# Singleton instance
+history_writer = HistoryWriter()
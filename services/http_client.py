@@ -0,0 +1,25 @@
+"""Shared HTTP connection pool for the Groq and OpenAI clients."""
+
+from importlib.util import find_spec
+import httpx
+import config
+
+
+# HTTP/2 needs the optional h2 package (pip install httpx[http2])
+_http2 = find_spec("h2") is not None
+
+# One pool for both APIs keeps TCP+TLS connections alive between calls
+http_client = httpx.AsyncClient(
+    http2=_http2,
+    limits=httpx.Limits(
+        max_connections=config.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=config.HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY
+    ),
+    follow_redirects=True
+)
+
+
+async def close_http_client() -> None:
+    """Close pooled connections (call on shutdown)."""
+    await http_client.aclose()
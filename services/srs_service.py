@@ -2,8 +2,9 @@
 
 from datetime import datetime, timedelta
 from typing import Tuple, List, Optional
-from sqlalchemy import select
+from sqlalchemy import select, func, case
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from models.models import User, UserProgress, Vocabulary
 import config
 
@@ -72,15 +73,17 @@ class SRSService:
             limit: Maximum number of words to return (default: config.MAX_REVIEWS_PER_SESSION)
         
         Returns:
-            List of UserProgress objects
+            List of UserProgress objects with word loaded
         """
         if limit is None:
             limit = config.MAX_REVIEWS_PER_SESSION
         
         now = datetime.utcnow()
         
+        # Load each word with its progress row (progress.word needs no extra query)
         query = (
             select(UserProgress)
+            .options(joinedload(UserProgress.word))
             .where(UserProgress.user_id == user_id)
             .where(UserProgress.next_review_time <= now)
             .order_by(UserProgress.next_review_time.asc())
@@ -90,6 +93,71 @@ class SRSService:
         result = await session.execute(query)
         return result.scalars().all()
     
+    @staticmethod
+    async def get_due_batch(
+        session: AsyncSession,
+        user_id: int,
+        limit: int = None
+    ) -> List[dict]:
+        """
+        Get due words joined with their vocabulary in one query.
+        
+        Args:
+            session: Database session
+            user_id: User ID
+            limit: Maximum number of words to return (default: config.MAX_REVIEWS_PER_SESSION)
+        
+        Returns:
+            List of plain dicts (safe to store in FSM state)
+        """
+        if limit is None:
+            limit = config.MAX_REVIEWS_PER_SESSION
+        
+        now = datetime.utcnow()
+        
+        query = (
+            select(
+                UserProgress.id.label('progress_id'),
+                Vocabulary.id.label('word_id'),
+                Vocabulary.word_polish,
+                Vocabulary.translation_ua,
+                Vocabulary.translation_ru
+            )
+            .join(Vocabulary, UserProgress.word_id == Vocabulary.id)
+            .where(UserProgress.user_id == user_id)
+            .where(UserProgress.next_review_time <= now)
+            .order_by(UserProgress.next_review_time.asc())
+            .limit(limit)
+        )
+        
+        result = await session.execute(query)
+        return [dict(row) for row in result.mappings()]
+    
+    @staticmethod
+    async def get_due_count(
+        session: AsyncSession,
+        user_id: int
+    ) -> int:
+        """
+        Count words due for review without loading them.
+        
+        Args:
+            session: Database session
+            user_id: User ID
+        
+        Returns:
+            Number of due words
+        """
+        now = datetime.utcnow()
+        
+        query = (
+            select(func.count(UserProgress.id))
+            .where(UserProgress.user_id == user_id)
+            .where(UserProgress.next_review_time <= now)
+        )
+        
+        return await session.scalar(query)
+    
     @staticmethod
     async def update_progress(
         session: AsyncSession,
@@ -106,13 +174,33 @@ class SRSService:
             quality: Recall quality (0-5)
             is_correct: Whether the answer was correct
         """
-        query = select(UserProgress).where(UserProgress.id == progress_id)
-        result = await session.execute(query)
-        progress = result.scalar_one_or_none()
+        progress = await session.get(UserProgress, progress_id)
         
         if not progress:
             return
         
+        SRSService.apply_review(progress, quality, is_correct)
+        
+        await session.commit()
+    
+    @staticmethod
+    def apply_review(
+        progress: UserProgress,
+        quality: int,
+        is_correct: bool,
+        reviewed_at: datetime = None
+    ) -> None:
+        """
+        Update SRS fields of a progress row in place (no commit).
+        
+        Args:
+            progress: UserProgress object
+            quality: Recall quality (0-5)
+            is_correct: Whether the answer was correct
+            reviewed_at: Review time (default: now)
+        """
+        reviewed_at = reviewed_at or datetime.utcnow()
+        
         # Calculate new SRS parameters
         interval_days, easiness_factor, repetitions = SRSService.calculate_next_review(
             quality=quality,
@@ -126,8 +214,8 @@ class SRSService:
         progress.interval_days = interval_days
         progress.easiness_factor = easiness_factor
         progress.repetitions = repetitions
-        progress.next_review_time = datetime.utcnow() + timedelta(days=interval_days)
-        progress.last_reviewed = datetime.utcnow()
+        progress.next_review_time = reviewed_at + timedelta(days=interval_days)
+        progress.last_reviewed = reviewed_at
         progress.times_reviewed += 1
         
         if is_correct:
@@ -137,8 +225,6 @@ class SRSService:
         
         # Update SRS stage (0-5)
         progress.srs_stage = min(5, repetitions)
-        
-        await session.commit()
     
     @staticmethod
     async def add_word_to_user(
@@ -159,12 +245,11 @@ class SRSService:
         """
         # Check if already exists
         query = (
-            select(UserProgress)
+            select(UserProgress.id)
             .where(UserProgress.user_id == user_id)
             .where(UserProgress.word_id == word_id)
         )
-        result = await session.execute(query)
-        existing = result.scalar_one_or_none()
+        existing = await session.scalar(query)
         
         if existing:
             return None
@@ -187,6 +272,53 @@ class SRSService:
         
         return progress
     
+    @staticmethod
+    async def add_words_to_user(
+        session: AsyncSession,
+        user_id: int,
+        word_ids: List[int]
+    ) -> int:
+        """
+        Add several words to user's learning queue (caller commits).
+        
+        Args:
+            session: Database session
+            user_id: User ID
+            word_ids: Vocabulary word IDs
+        
+        Returns:
+            Number of words added (words already in the queue are skipped)
+        """
+        if not word_ids:
+            return 0
+        
+        # One query for all words already in the queue
+        query = (
+            select(UserProgress.word_id)
+            .where(UserProgress.user_id == user_id)
+            .where(UserProgress.word_id.in_(word_ids))
+        )
+        result = await session.execute(query)
+        existing = set(result.scalars().all())
+        
+        now = datetime.utcnow()  # Review immediately
+        new_ids = [word_id for word_id in dict.fromkeys(word_ids) if word_id not in existing]
+        session.add_all([
+            UserProgress(
+                user_id=user_id,
+                word_id=word_id,
+                srs_stage=0,
+                next_review_time=now,
+                last_quality=0,
+                repetitions=0,
+                easiness_factor=2.5,
+                interval_days=0
+            )
+            for word_id in new_ids
+        ])
+        
+        return len(new_ids)
+    
     @staticmethod
     async def get_review_stats(
         session: AsyncSession,
@@ -202,27 +334,25 @@ class SRSService:
         Returns:
             Dictionary with stats
         """
-        query = select(UserProgress).where(UserProgress.user_id == user_id)
-        result = await session.execute(query)
-        all_progress = result.scalars().all()
-        
-        if not all_progress:
-            return {
-                "total_words": 0,
-                "due_now": 0,
-                "mastered": 0,
-                "learning": 0,
-                "new": 0
-            }
-        
         now = datetime.utcnow()
         
+        # Aggregate in the database instead of loading every progress row
+        query = select(
+            func.count(UserProgress.id),
+            func.count(case((UserProgress.next_review_time <= now, 1))),
+            func.count(case((UserProgress.srs_stage >= 4, 1))),
+            func.count(case(((UserProgress.srs_stage > 0) & (UserProgress.srs_stage < 4), 1))),
+            func.count(case((UserProgress.srs_stage == 0, 1)))
+        ).where(UserProgress.user_id == user_id)
+        result = await session.execute(query)
+        total_words, due_now, mastered, learning, new = result.one()
+        
         stats = {
-            "total_words": len(all_progress),
-            "due_now": sum(1 for p in all_progress if p.next_review_time <= now),
-            "mastered": sum(1 for p in all_progress if p.srs_stage >= 4),
-            "learning": sum(1 for p in all_progress if 0 < p.srs_stage < 4),
-            "new": sum(1 for p in all_progress if p.srs_stage == 0)
+            "total_words": total_words,
+            "due_now": due_now,
+            "mastered": mastered,
+            "learning": learning,
+            "new": new
         }
         
         return stats
@@ -1,27 +1,53 @@
 """Text-to-Speech service using OpenAI TTS API."""
 
 import os
+import time
+import asyncio
 import hashlib
+import tempfile
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 from openai import AsyncOpenAI
 import config
+from services.http_client import http_client
+
+
+@lru_cache(maxsize=2048)
+def _text_hash(text: str) -> str:
+    """Hash of text used as audio file name (cached, same texts recur)."""
+    return hashlib.md5(text.encode()).hexdigest()
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    """Write file then rename, so readers never see a partial file."""
+    # Unique temp name: concurrent writes of the same text must not share it
+    with tempfile.NamedTemporaryFile(dir=path.parent, suffix='.tmp', delete=False) as f:
+        f.write(data)
+    try:
+        os.replace(f.name, path)
+    except OSError:
+        os.unlink(f.name)
+        raise
 
 
 class TTSService:
     """Service for generating Polish audio using OpenAI TTS."""
     
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=config.OPENAI_API_KEY) if config.OPENAI_API_KEY else None
+        self.client = AsyncOpenAI(api_key=config.OPENAI_API_KEY, http_client=http_client) if config.OPENAI_API_KEY else None
         self.model = config.TTS_MODEL
         self.voice = config.TTS_VOICE
         self.audio_dir = Path(config.TTS_AUDIO_DIR)
         self.audio_dir.mkdir(exist_ok=True)
+        
+        # Names of cached audio files (checked instead of stat-ing the disk)
+        self._known_files = {p.name for p in self.audio_dir.glob("*.mp3")}
+        self._cleanup_task: Optional[asyncio.Task] = None
     
     def _get_cache_path(self, text: str) -> Path:
         """Generate cache file path based on text hash."""
-        text_hash = hashlib.md5(text.encode()).hexdigest()
-        return self.audio_dir / f"{text_hash}.mp3"
+        return self.audio_dir / f"{_text_hash(text)}.mp3"
     
     async def generate_speech(
         self,
@@ -45,7 +71,7 @@ class TTSService:
         cache_path = self._get_cache_path(text)
         
         # Check cache
-        if use_cache and cache_path.exists():
+        if use_cache and cache_path.name in self._known_files:
             print(f"✅ Using cached TTS: {cache_path.name}")
             return str(cache_path)
         
@@ -57,9 +83,9 @@ class TTSService:
                 input=text
             )
             
-            # Save to file
-            with open(cache_path, 'wb') as f:
-                f.write(response.content)
+            # Disk write runs in a thread so it doesn't block the event loop
+            await asyncio.to_thread(_write_atomic, cache_path, response.content)
+            self._known_files.add(cache_path.name)
             
             print(f"✅ Generated TTS: {cache_path.name}")
             return str(cache_path)
@@ -68,22 +94,59 @@ class TTSService:
             print(f"❌ TTS generation failed: {e}")
             return None
     
-    def cleanup_old_files(self, max_age_days: int = 7):
+    def _sweep(self, max_age_days: int) -> list[str]:
+        """Delete old audio files (blocking, run in a thread)."""
+        now = time.time()
+        max_age_seconds = max_age_days * 86400
+        deleted = []
+        
+        # scandir entries carry the file metadata, no separate stat per path
+        with os.scandir(self.audio_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.mp3') and now - entry.stat().st_mtime > max_age_seconds:
+                    os.unlink(entry.path)
+                    deleted.append(entry.name)
+        
+        return deleted
+    
+    async def cleanup_old_files(self, max_age_days: int = config.TTS_CACHE_MAX_AGE_DAYS):
         """
-        Clean up old cached audio files.
+        Clean up old cached audio files without blocking the event loop.
         
         Args:
             max_age_days: Maximum age of files to keep
         """
-        import time
+        deleted = await asyncio.to_thread(self._sweep, max_age_days)
+        self._known_files.difference_update(deleted)
         
-        now = time.time()
-        max_age_seconds = max_age_days * 86400
+        if deleted:
+            print(f"🗑️ Deleted {len(deleted)} old TTS files")
+    
+    async def _periodic_cleanup(self) -> None:
+        """Run cache cleanup every TTS_CLEANUP_INTERVAL seconds."""
+        while True:
+            try:
+                await self.cleanup_old_files()
+            except Exception as e:
+                print(f"❌ TTS cache cleanup failed: {e}")
+            await asyncio.sleep(config.TTS_CLEANUP_INTERVAL)
+    
+    def start(self) -> None:
+        """Start periodic cache cleanup (call once the event loop is running)."""
+        if self._cleanup_task is None:
+            self._cleanup_task = asyncio.create_task(self._periodic_cleanup())
+    
+    async def stop(self) -> None:
+        """Stop periodic cache cleanup."""
+        if self._cleanup_task is None:
+            return
         
-        for file_path in self.audio_dir.glob("*.mp3"):
-            if now - file_path.stat().st_mtime > max_age_seconds:
-                file_path.unlink()
-                print(f"🗑️ Deleted old TTS file: {file_path.name}")
+        self._cleanup_task.cancel()
+        try:
+            await self._cleanup_task
+        except asyncio.CancelledError:
+            pass
+        self._cleanup_task = None
 
 
 # Singleton instance
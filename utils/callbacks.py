@@ -0,0 +1,53 @@
+"""Callback data factories and helpers for acknowledging callback queries."""
+
+import asyncio
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import CallbackQuery
+
+
+class ScenarioCB(CallbackData, prefix="scenario"):
+    """Survival scenario selection."""
+    id: int
+
+
+class LevelCB(CallbackData, prefix="level"):
+    """Level selection in settings."""
+    level: str
+
+
+class VocabFilterCB(CallbackData, prefix="vocab_filter"):
+    """Vocabulary browser filter (all, known, learning, new)."""
+    kind: str
+
+
+class VocabPageCB(CallbackData, prefix="vocab_page"):
+    """Vocabulary browser page."""
+    page: int
+
+
+class VocabAddCB(CallbackData, prefix="vocab_add"):
+    """Add word to learning list."""
+    word_id: int
+
+
+class VocabRemoveCB(CallbackData, prefix="vocab_remove"):
+    """Remove word from learning list."""
+    word_id: int
+
+
+# Keep references so pending acknowledgements are not garbage collected
+_pending: set[asyncio.Task] = set()
+
+
+def _on_done(task: asyncio.Task) -> None:
+    _pending.discard(task)
+    if not task.cancelled() and task.exception():
+        # Usually the query was already answered elsewhere; nothing to do
+        print(f"⚠️ Callback answer failed: {task.exception()}")
+
+
+def answer_early(callback: CallbackQuery) -> None:
+    """Acknowledge callback in the background so the button stops spinning."""
+    task = asyncio.create_task(callback.answer())
+    _pending.add(task)
+    task.add_done_callback(_on_done)
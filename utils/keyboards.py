@@ -1,9 +1,21 @@
 """Keyboard layouts for bot interactions."""
 
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton
+from functools import lru_cache
 from typing import List
 
+from utils.callbacks import ScenarioCB, LevelCB, VocabFilterCB, VocabPageCB, VocabAddCB, VocabRemoveCB
 
+
+LEVEL_EMOJI = {"A1": "🟢", "A2": "🟡", "B1": "🟠"}
+
+VOCAB_FILTER_ROWS = (
+    (("📚 Всі", "all"), ("✅ Знаю", "known")),
+    (("📖 Вивчаю", "learning"), ("🆕 Нові", "new"))
+)
+
+
+@lru_cache(maxsize=None)
 def get_main_menu_keyboard() -> InlineKeyboardMarkup:
     """Get main menu keyboard."""
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
@@ -19,13 +31,19 @@ def get_main_menu_keyboard() -> InlineKeyboardMarkup:
 
 def get_scenario_selection_keyboard(scenarios: List[dict]) -> InlineKeyboardMarkup:
     """Get scenario selection keyboard."""
+    return _build_scenario_keyboard(tuple((s['id'], s['title'], s['level']) for s in scenarios))
+
+
+@lru_cache(maxsize=64)
+def _build_scenario_keyboard(scenarios: tuple) -> InlineKeyboardMarkup:
+    """Build scenario keyboard from (id, title, level) tuples (cached, keyboards are never mutated)."""
     buttons = []
-    for scenario in scenarios:
-        level_emoji = {"A1": "🟢", "A2": "🟡", "B1": "🟠"}.get(scenario["level"], "⚪")
+    for scenario_id, title, level in scenarios:
+        level_emoji = LEVEL_EMOJI.get(level, "⚪")
         buttons.append([
             InlineKeyboardButton(
-                text=f"{level_emoji} {scenario['title']}",
-                callback_data=f"scenario_{scenario['id']}"
+                text=f"{level_emoji} {title}",
+                callback_data=ScenarioCB(id=scenario_id).pack()
             )
         ])
     buttons.append([InlineKeyboardButton(text="🔙 Назад до Меню", callback_data="main_menu")])
@@ -33,8 +51,19 @@ def get_scenario_selection_keyboard(scenarios: List[dict]) -> InlineKeyboardMark
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+def get_answer_index_map(question_id: str, count: int = 4) -> dict[str, int]:
+    """Get mapping of quiz answer callback data to answer index."""
+    return {f"{question_id}_{i}": i for i in range(count)}
+
+
 def get_quiz_keyboard(options: List[str], question_id: str = "quiz", show_cancel: bool = False) -> InlineKeyboardMarkup:
     """Get quiz answer keyboard."""
+    return _build_quiz_keyboard(tuple(options), question_id, show_cancel)
+
+
+@lru_cache(maxsize=256)
+def _build_quiz_keyboard(options: tuple, question_id: str, show_cancel: bool) -> InlineKeyboardMarkup:
+    """Build quiz keyboard (cached, keyboards are never mutated)."""
     buttons = []
     for i, option in enumerate(options):
         buttons.append([
@@ -50,6 +79,7 @@ def get_quiz_keyboard(options: List[str], question_id: str = "quiz", show_cancel
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+@lru_cache(maxsize=None)
 def get_continue_keyboard(next_action: str = "continue") -> InlineKeyboardMarkup:
     """Get continue/next keyboard."""
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
@@ -58,6 +88,7 @@ def get_continue_keyboard(next_action: str = "continue") -> InlineKeyboardMarkup
     return keyboard
 
 
+@lru_cache(maxsize=64)
 def get_review_start_keyboard(due_count: int) -> InlineKeyboardMarkup:
     """Get keyboard to start review session."""
     if due_count == 0:
@@ -72,6 +103,7 @@ def get_review_start_keyboard(due_count: int) -> InlineKeyboardMarkup:
     return keyboard
 
 
+@lru_cache(maxsize=None)
 def get_settings_keyboard(current_level: str) -> InlineKeyboardMarkup:
     """Get settings keyboard."""
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
@@ -81,44 +113,41 @@ def get_settings_keyboard(current_level: str) -> InlineKeyboardMarkup:
     return keyboard
 
 
+@lru_cache(maxsize=None)
 def get_level_selection_keyboard() -> InlineKeyboardMarkup:
     """Get level selection keyboard."""
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="🟢 A1 (Початковий)", callback_data="level_A1")],
-        [InlineKeyboardButton(text="🟡 A2 (Елементарний)", callback_data="level_A2")],
-        [InlineKeyboardButton(text="🟠 B1 (Середній)", callback_data="level_B1")],
+        [InlineKeyboardButton(text="🟢 A1 (Початковий)", callback_data=LevelCB(level="A1").pack())],
+        [InlineKeyboardButton(text="🟡 A2 (Елементарний)", callback_data=LevelCB(level="A2").pack())],
+        [InlineKeyboardButton(text="🟠 B1 (Середній)", callback_data=LevelCB(level="B1").pack())],
         [InlineKeyboardButton(text="🔙", callback_data="settings")]
     ])
     return keyboard
 
 
+@lru_cache(maxsize=512)
 def get_vocabulary_browser_keyboard(page: int = 0, total_pages: int = 1, filter_type: str = "all") -> InlineKeyboardMarkup:
-    """Get vocabulary browser keyboard with filters and pagination."""
+    """Get vocabulary browser keyboard with filters and pagination (cached, never mutated)."""
     buttons = []
     
-    # Filter buttons
-    filter_row = []
-    filters = [
-        ("📚 Всі", "vocab_filter_all"),
-        ("✅ Знаю", "vocab_filter_known"),
-        ("📖 Вивчаю", "vocab_filter_learning"),
-        ("🆕 Нові", "vocab_filter_new")
-    ]
-    for text, data in filters:
-        marker = "• " if filter_type in data else ""
-        filter_row.append(InlineKeyboardButton(text=f"{marker}{text}", callback_data=data))
-    
-    buttons.append(filter_row[:2])
-    buttons.append(filter_row[2:])
+    # Filter buttons, two per row
+    for filters in VOCAB_FILTER_ROWS:
+        buttons.append([
+            InlineKeyboardButton(
+                text=f"{'• ' if filter_type == kind else ''}{text}",
+                callback_data=VocabFilterCB(kind=kind).pack()
+            )
+            for text, kind in filters
+        ])
     
     # Pagination
     if total_pages > 1:
         nav_row = []
         if page > 0:
-            nav_row.append(InlineKeyboardButton(text="◀️", callback_data=f"vocab_page_{page-1}"))
+            nav_row.append(InlineKeyboardButton(text="◀️", callback_data=VocabPageCB(page=page - 1).pack()))
         nav_row.append(InlineKeyboardButton(text=f"{page+1}/{total_pages}", callback_data="vocab_noop"))
         if page < total_pages - 1:
-            nav_row.append(InlineKeyboardButton(text="▶️", callback_data=f"vocab_page_{page+1}"))
+            nav_row.append(InlineKeyboardButton(text="▶️", callback_data=VocabPageCB(page=page + 1).pack()))
         buttons.append(nav_row)
     
     # Actions
@@ -128,20 +157,22 @@ def get_vocabulary_browser_keyboard(page: int = 0, total_pages: int = 1, filter_
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+@lru_cache(maxsize=256)
 def get_word_detail_keyboard(word_id: int, in_learning: bool = False) -> InlineKeyboardMarkup:
     """Get keyboard for word details view."""
     buttons = []
     
     if in_learning:
-        buttons.append([InlineKeyboardButton(text="🗑️ Видалити зі списку", callback_data=f"vocab_remove_{word_id}")])
+        buttons.append([InlineKeyboardButton(text="🗑️ Видалити зі списку", callback_data=VocabRemoveCB(word_id=word_id).pack())])
     else:
-        buttons.append([InlineKeyboardButton(text="➕ Додати до вивчення", callback_data=f"vocab_add_{word_id}")])
+        buttons.append([InlineKeyboardButton(text="➕ Додати до вивчення", callback_data=VocabAddCB(word_id=word_id).pack())])
     
     buttons.append([InlineKeyboardButton(text="🔙", callback_data="vocabulary_browser")])
     
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+@lru_cache(maxsize=64)
 def get_session_complete_keyboard(errors_count: int = 0) -> InlineKeyboardMarkup:
     """Get keyboard for session completion with option to review errors."""
     buttons = []
@@ -155,6 +186,7 @@ def get_session_complete_keyboard(errors_count: int = 0) -> InlineKeyboardMarkup
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+@lru_cache(maxsize=None)
 def get_flashcard_word_keyboard() -> InlineKeyboardMarkup:
     """Get keyboard for showing word in flashcard mode."""
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
@@ -163,6 +195,7 @@ def get_flashcard_word_keyboard() -> InlineKeyboardMarkup:
     return keyboard
 
 
+@lru_cache(maxsize=None)
 def get_flashcard_feedback_keyboard() -> InlineKeyboardMarkup:
     """Get keyboard for flashcard feedback (know/don't know)."""
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
@@ -173,6 +206,7 @@ def get_flashcard_feedback_keyboard() -> InlineKeyboardMarkup:
     return keyboard
 
 
+@lru_cache(maxsize=None)
 def get_bottom_menu_keyboard() -> ReplyKeyboardMarkup:
     """Get persistent bottom menu keyboard."""
     keyboard = ReplyKeyboardMarkup(
@@ -70,10 +70,10 @@ FILL_IN_BLANK_PROMPT = """Ти експерт з польської мови, я
 }}
 """
 
+# Static system prompt (no placeholders) so every request shares the same prefix
+# and the provider can reuse its prompt cache; word details go in the user message
 FILL_IN_BLANK_WITH_EXPLANATION_PROMPT = """Ти експерт з польської мови, який створює вправи на повторення слів для українців.
-
-Цільове слово: "{word}" (Переклад: {translation_ua})
-Рівень: {level}
+Цільове слово та рівень учня будуть у повідомленні користувача.
 
 КРИТИЧНО ВАЖЛИВО - ФОРМАТ:
 1. Речення має бути ПОВНІСТЮ ПОЛЬСЬКОЮ мовою
@@ -100,7 +100,7 @@ FILL_IN_BLANK_WITH_EXPLANATION_PROMPT = """Ти експерт з польськ
 - Приклад використання слова в іншому реченні
 
 Виведи ТІЛЬКИ валідний JSON:
-{{
+{
   "sentence": "ПОВНІСТЮ ПОЛЬСЬКЕ речення з _____",
   "sentence_translation": "ПОВНІСТЮ УКРАЇНСЬКИЙ переклад речення з _____",
   "correct_answer": "правильна форма слова",
@@ -108,9 +108,15 @@ FILL_IN_BLANK_WITH_EXPLANATION_PROMPT = """Ти експерт з польськ
   "distractor_2": "схоже слово (неправильне)",
   "distractor_3": "хибний друг/помилка",
   "explanation": "Детальне пояснення українською (3-5 речень): граматика, чому інші неправильні, приклад використання"
-}}
+}
 """
 
+FILL_IN_BLANK_USER_PROMPT = """Цільове слово: "{word}" (Переклад: {translation_ua})
+Рівень: {level}
+
+Створи вправу з пропуском для цього слова."""
+
+
 SCENARIO_INTRO_PROMPT = """Ти викладач польської мови. Твоє завдання - створити вступ до навчального сценарію.
 
 Сценарій: "{situation}"
@@ -0,0 +1,42 @@
+"""In-memory TTL cache for survival scenario lists by user level."""
+
+import time
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.models import Situation
+import config
+
+
+# user level -> (expires_at, list of scenario dicts)
+_cache: dict[str, tuple[float, list[dict]]] = {}
+
+
+def invalidate_scenarios() -> None:
+    """Drop all cached scenario lists (call after editing situations)."""
+    _cache.clear()
+
+
+async def get_scenarios(session: AsyncSession, level: str) -> list[dict]:
+    """
+    Get active scenarios available for level, hitting the database only on cache miss.
+
+    Args:
+        session: Database session
+        level: User level (A1, A2, B1)
+
+    Returns:
+        List of dicts with id, title and level
+    """
+    entry = _cache.get(level)
+    if entry and entry[0] > time.monotonic():
+        return entry[1]
+
+    query = select(Situation.id, Situation.title, Situation.level).where(
+        Situation.is_active == True,
+        Situation.level <= level
+    )
+    result = await session.execute(query)
+    scenarios = [dict(row) for row in result.mappings()]
+
+    _cache[level] = (time.monotonic() + config.SCENARIO_CACHE_TTL, scenarios)
+    return scenarios
@@ -0,0 +1,68 @@
+"""In-memory TTL cache for user lookups by Telegram ID."""
+
+import time
+from dataclasses import dataclass
+from typing import Optional
+from sqlalchemy import select, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.models import User
+import config
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """Lightweight snapshot of frequently read user fields."""
+    id: int
+    level: str
+    streak_days: int
+
+
+# Built once at import; only the cached columns, no full ORM hydration
+_USER_BY_TELEGRAM_ID = select(User.id, User.level, User.streak_days).where(
+    User.telegram_id == bindparam('telegram_id')
+)
+
+# telegram_id -> (expires_at, CachedUser)
+_cache: dict[int, tuple[float, CachedUser]] = {}
+
+
+def cache_user(telegram_id: int, user) -> CachedUser:
+    """Store user snapshot (User object or id/level/streak_days row) in cache and return it."""
+    cached = CachedUser(id=user.id, level=user.level, streak_days=user.streak_days or 0)
+
+    # Evict oldest entry when full (dicts keep insertion order)
+    if telegram_id not in _cache and len(_cache) >= config.USER_CACHE_MAX_SIZE:
+        _cache.pop(next(iter(_cache)))
+
+    _cache[telegram_id] = (time.monotonic() + config.USER_CACHE_TTL, cached)
+    return cached
+
+
+def invalidate_user(telegram_id: int) -> None:
+    """Drop cached user (call after mutating user row)."""
+    _cache.pop(telegram_id, None)
+
+
+async def get_user(session: AsyncSession, telegram_id: int) -> Optional[CachedUser]:
+    """
+    Get user by Telegram ID, hitting the database only on cache miss.
+
+    Args:
+        session: Database session
+        telegram_id: Telegram user ID
+
+    Returns:
+        CachedUser or None if user doesn't exist
+    """
+    entry = _cache.get(telegram_id)
+    if entry and entry[0] > time.monotonic():
+        return entry[1]
+
+    result = await session.execute(_USER_BY_TELEGRAM_ID, {'telegram_id': telegram_id})
+    user = result.first()
+
+    if not user:
+        invalidate_user(telegram_id)
+        return None
+
+    return cache_user(telegram_id, user)
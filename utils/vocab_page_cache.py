@@ -0,0 +1,43 @@
+"""In-memory cache of rendered vocabulary browser pages per user."""
+
+import time
+from typing import Optional
+import config
+
+
+# user_id -> (expires_at, {(filter_type, page): (text, total_pages)})
+_cache: dict[int, tuple[float, dict[tuple[str, int], tuple[str, int]]]] = {}
+
+
+def invalidate_vocab_pages(user_id: Optional[int] = None) -> None:
+    """
+    Drop cached pages of a user (after their word stats change) or of everyone.
+
+    Args:
+        user_id: User ID, or None after the vocabulary itself changed
+    """
+    if user_id is None:
+        _cache.clear()
+    else:
+        _cache.pop(user_id, None)
+
+
+def get_vocab_page(user_id: int, filter_type: str, page: int) -> Optional[tuple[str, int]]:
+    """Get cached (text, total_pages) of a page, or None on miss."""
+    entry = _cache.get(user_id)
+    if not entry or entry[0] <= time.monotonic():
+        return None
+    return entry[1].get((filter_type, page))
+
+
+def cache_vocab_page(user_id: int, filter_type: str, page: int, text: str, total_pages: int) -> None:
+    """Store rendered page of a user."""
+    entry = _cache.get(user_id)
+    if not entry or entry[0] <= time.monotonic():
+        # Evict oldest user when full (dicts keep insertion order)
+        if user_id not in _cache and len(_cache) >= config.VOCAB_PAGE_CACHE_MAX_USERS:
+            _cache.pop(next(iter(_cache)))
+        entry = (time.monotonic() + config.VOCAB_PAGE_CACHE_TTL, {})
+        _cache[user_id] = entry
+
+    entry[1][(filter_type, page)] = (text, total_pages)